@@ -1,7 +1,33 @@
 from .yandex_gpt import YandexGPTClient
 from .giga_chat import GigaChatClient
+from .lm_studio import LMStudioClient
+from .transport import HTTPTransport
+from .token_manager import TokenManager
+from .response_cache import ResponseCache, get_response_cache, is_cached
+from .providers import Provider, Usage, PROVIDERS, register_provider, create_provider, acreate_provider
+from .operations import OperationPoller, get_operation_poller
+from .rate_limit import RateLimits, ProviderLimiter, TokenBucket, CircuitBreaker, CircuitOpenError
 
 __all__ = [
     'YandexGPTClient',
-    'GigaChatClient'
+    'GigaChatClient',
+    'LMStudioClient',
+    'HTTPTransport',
+    'TokenManager',
+    'ResponseCache',
+    'get_response_cache',
+    'is_cached',
+    'RateLimits',
+    'ProviderLimiter',
+    'TokenBucket',
+    'CircuitBreaker',
+    'CircuitOpenError',
+    'OperationPoller',
+    'get_operation_poller',
+    'Provider',
+    'Usage',
+    'PROVIDERS',
+    'register_provider',
+    'create_provider',
+    'acreate_provider'
 ] 
\ No newline at end of file
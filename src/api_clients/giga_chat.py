@@ -1,52 +1,87 @@
 from itertools import product
 from collections import Counter
-import requests
 from getpass import getpass
 import uuid
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, Optional, Tuple
 import os
+import asyncio
+import json
+
+import httpx
+
+from .transport import HTTPTransport
+from .token_manager import TokenManager
+from .response_cache import ResponseCache
+from .rate_limit import CircuitOpenError, ProviderLimiter, RateLimits
 
 class GigaChatClient:
     """Client for interacting with GigaChat API."""
     
     TOKEN_URL = "https://ngw.devices.sberbank.ru:9443/api/v2/oauth"
     API_URL = "https://gigachat.devices.sberbank.ru/api/v1/chat/completions"
+    PROVIDER = "gigaChat"
+
+    # Token managers shared by every client using the same authorization key
+    _token_managers: Dict[str, TokenManager] = {}
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache: Optional[ResponseCache] = None):
         """
         Initialize GigaChat client.
         
         Args:
-            catalog_id: Yandex Cloud Catalog ID
-            api_key: Yandex Cloud Service Account API Key
+            api_key: GigaChat authorization key
+            cache: Optional response cache, identical requests are answered from it
         """
         self.api_key = api_key
+        self.cache = cache
+        self.tokens = self.get_token_manager(api_key)
 
+    @classmethod
+    def get_token_manager(cls, api_key: str) -> TokenManager:
+        """Get the cached token manager for an authorization key."""
+        manager = cls._token_managers.get(api_key)
+        if manager is None:
+            manager = TokenManager(lambda: cls._fetch_token(api_key))
+            cls._token_managers[api_key] = manager
+        return manager
 
+    @classmethod
+    async def _fetch_token(cls, api_key: str) -> Tuple[str, float]:
+        """Request a new OAuth access token, returns the token and its expiry in seconds."""
         payload={"scope": "GIGACHAT_API_PERS"}
         headers = {
         'Content-Type': 'application/x-www-form-urlencoded',
         'Accept': 'application/json',
-        'Authorization': f'Basic {self.api_key}',
+        'Authorization': f'Basic {api_key}',
         'RqUID': str(uuid.uuid4())
         }
 
-        response = requests.request("POST", self.TOKEN_URL, headers=headers, data=payload, verify="./api_clients/certificate/russian_trusted_root_ca_pem.crt")
+        response = await HTTPTransport.get_client(cls.PROVIDER).post(cls.TOKEN_URL, headers=headers, data=payload)
+        response.raise_for_status()
+        data = response.json()
 
-        self.access_token = response.json()["access_token"]
+        # expires_at is a unix timestamp in milliseconds
+        return data["access_token"], data["expires_at"] / 1000
 
-        payload={}
-        
+    @property
+    def limiter(self) -> ProviderLimiter:
+        """Rate limiter shared by every client with the same authorization key."""
+        return RateLimits.get(self.PROVIDER, self.api_key)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared pooled HTTP client of the provider."""
+        return HTTPTransport.get_client(self.PROVIDER)
         
-    def _get_headers(self) -> Dict[str, str]:
+    def _get_headers(self, access_token: str) -> Dict[str, str]:
         """Get headers for API requests."""
         return {
         'Content-Type': 'application/json',
         'Accept': 'application/json',
-        'Authorization': f'Bearer {self.access_token}'
+        'Authorization': f'Bearer {access_token}'
         }
     
-    def _prepare_completion_request(self, user_content: str) -> Dict[str, Any]:
+    def _prepare_completion_request(self, user_content: str, stream: bool = False) -> Dict[str, Any]:
         """Prepare the completion request payload."""
         return {
         "model": "GigaChat",
@@ -56,40 +91,115 @@ class GigaChatClient:
             "content": user_content,
             }
         ],
-        "stream": False,
+        "stream": stream,
         "repetition_penalty": 1,
         }
 
-    def send_request(self, user_content:str):
-        print(self._prepare_completion_request(user_content))
+    async def _post(self, payload: Dict[str, Any]) -> httpx.Response:
+        access_token = await self.tokens.get_token()
+        response = await self.http.post(self.API_URL, headers=self._get_headers(access_token), json=payload)
+        if response.status_code == 401:
+            # The token was revoked or expired early, fetch a new one and retry once
+            self.tokens.invalidate(access_token)
+            access_token = await self.tokens.get_token()
+            response = await self.http.post(self.API_URL, headers=self._get_headers(access_token), json=payload)
+        return response
+
+    async def stream_response(self, user_content: str) -> AsyncIterator[str]:
+        """
+        Stream the answer to a prompt as it is generated.
+
+        Streams bypass the response cache, the retries and the circuit breaker, the rate limit still applies.
+
+        Args:
+            user_content: User message content
+
+        Yields:
+            str: Text fragments of the answer
+        """
+        payload = self._prepare_completion_request(user_content, stream=True)
+        await self.limiter.bucket.acquire()
+        response = await self._open_stream(payload)
+        try:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                # Server-sent events: 'data: {chunk}' lines, terminated by 'data: [DONE]'
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                text = choices[0].get("delta", {}).get("content")
+                if text:
+                    yield text
+        finally:
+            await response.aclose()
 
-        response = requests.request("POST", self.API_URL, headers=self._get_headers(), json=self._prepare_completion_request(user_content), verify="./api_clients/certificate/russian_trusted_root_ca_pem.crt")
-        print(response)
-        print(response.text)
+    async def _open_stream(self, payload: Dict[str, Any]) -> httpx.Response:
+        """Start a streamed request, retried once with a new token on 401 like `_post`, before any byte is read."""
+        access_token = await self.tokens.get_token()
+        response = await self.http.send(self.http.build_request("POST", self.API_URL, headers=self._get_headers(access_token), json=payload), stream=True)
+        if response.status_code == 401:
+            await response.aclose()
+            self.tokens.invalidate(access_token)
+            access_token = await self.tokens.get_token()
+            response = await self.http.send(self.http.build_request("POST", self.API_URL, headers=self._get_headers(access_token), json=payload), stream=True)
+        return response
+
+    async def send_request(self, user_content:str, max_attempts: int = 10, delay: float = 3) -> httpx.Response:
+        """
+        Send a completion request, throttled by the shared rate limiter.
+
+        429 and 5xx answers are retried with backoff.
+
+        Args:
+            user_content: User message content
+            max_attempts: Maximum number of attempts
+            delay: Base delay between attempts in seconds
+
+        Returns:
+            httpx.Response: Completion response
+        """
+        payload = self._prepare_completion_request(user_content)
+        if self.cache is not None:
+            cached = await self.cache.aget_response(self.PROVIDER, payload, self.API_URL)
+            if cached is not None:
+                return cached
+
+        response = await self.limiter.call(lambda: self._post(payload), max_attempts=max_attempts, delay=delay)
+
+        if self.cache is not None:
+            await self.cache.aput_response(self.PROVIDER, payload, response)
         return response
 
     
-    def generate_response(
+    async def generate_response(
         self,
         user_content: str,
         max_attempts: int = 10,
         delay: int = 3,
-    ) -> Optional[str]:
+    ) -> Optional[httpx.Response]:
         """
         Send request and get response in one call.
         
         Args:
-            system_content: System message content
             user_content: User message content
             max_attempts: Maximum number of attempts to get the response
-            delay: Delay between attempts in seconds
-            verbose: Whether to print response details
+            delay: Base delay between attempts in seconds
             
         Returns:
-            Optional[str]: Response text if successful, None otherwise
+            Optional[httpx.Response]: Response if successful, None otherwise
         """
-        request = self.send_request(user_content)
-        if not request:
+        try:
+            request = await self.send_request(user_content, max_attempts, delay)
+        except (CircuitOpenError, httpx.TransportError) as e:
+            print(f"GigaChat request failed: {e}")
+            return None
+        if request.is_error:
+            print(f"GigaChat request failed: {request.status_code} {request.text}")
             return None
         return request
 
@@ -105,7 +215,7 @@ if __name__ == '__main__':
         user_content = "Tell me a short story about a robot."
         
         print("\nSending request to GigaChat...")
-        response = client.generate_response(user_content)
+        response = asyncio.run(client.generate_response(user_content))
 
         if response:
             print("\n--- Response ---")
@@ -1 +1,236 @@
+"""OpenAI-compatible chat completions client for LM Studio, llama.cpp, vLLM and OpenAI."""
+import os
+import asyncio
+import json
+from typing import Optional, Dict, Any, AsyncIterator, List, Sequence, Tuple
 
+import httpx
+
+from .transport import HTTPTransport
+from .response_cache import ResponseCache
+from .rate_limit import CircuitOpenError, ProviderLimiter, RateLimits
+
+LM_STUDIO_URL = "http://localhost:1234/v1"
+OPENAI_URL = "https://api.openai.com/v1"
+OPENAI_MODEL = "gpt-4o-mini"
+
+# Requests in flight per generate_batch call, local servers queue anything beyond their parallel slots
+LM_STUDIO_BATCH_CONCURRENCY = int(os.environ.get("LM_STUDIO_BATCH_CONCURRENCY", 8))
+
+
+class LMStudioClient:
+    """Client for OpenAI-compatible chat completion servers."""
+
+    PROVIDER = "lmStudio"
+
+    def __init__(
+        self,
+        base_url: str = LM_STUDIO_URL,
+        model: Optional[str] = None,
+        api_key: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        provider: str = PROVIDER,
+    ):
+        """
+        Initialize OpenAI-compatible client.
+
+        Args:
+            base_url: API root up to and including '/v1'
+            model: Model identifier, the first model the server lists by default
+            api_key: Optional bearer token, local servers usually need none
+            cache: Optional response cache, identical requests are answered from it
+            provider: Provider name the connection pool and rate limiter are shared under, e.g. 'lmStudio' or 'chatGPT'
+        """
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key
+        self.cache = cache
+        self.provider = provider
+        self._model_lock = asyncio.Lock()
+
+    @property
+    def limiter(self) -> ProviderLimiter:
+        """Rate limiter shared by every client of the same server."""
+        return RateLimits.get(self.provider, self.base_url)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared pooled HTTP client of the provider."""
+        return HTTPTransport.get_client(self.provider)
+
+    @property
+    def completions_url(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    def _get_headers(self) -> Dict[str, str]:
+        """Get headers for API requests."""
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    async def get_model(self) -> str:
+        """Model to request, looked up once from the server's /models list if not configured."""
+        if self.model is None:
+            # Concurrent first requests wait for one lookup
+            async with self._model_lock:
+                if self.model is None:
+                    response = await self.http.get(f"{self.base_url}/models", headers=self._get_headers())
+                    response.raise_for_status()
+                    models = response.json().get("data", [])
+                    if not models:
+                        raise RuntimeError(f"No models loaded on {self.base_url}")
+                    self.model = models[0]["id"]
+        return self.model
+
+    def _prepare_completion_request(self, model: str, system_content: Optional[str], user_content: str, stream: bool = False) -> Dict[str, Any]:
+        """Prepare the completion request payload."""
+        messages = [{"role": "user", "content": user_content}]
+        if system_content and system_content.strip():
+            messages.insert(0, {"role": "system", "content": system_content})
+        return {
+            "model": model,
+            "messages": messages,
+            "temperature": 0,
+            "max_tokens": 2000,
+            "stream": stream,
+        }
+
+    async def send_request(self, system_content: Optional[str], user_content: str, max_attempts: int = 10, delay: float = 3) -> httpx.Response:
+        """
+        Send a completion request, throttled by the shared rate limiter.
+
+        429 and 5xx answers are retried with backoff.
+
+        Args:
+            system_content: Optional system message content
+            user_content: User message content
+            max_attempts: Maximum number of attempts
+            delay: Base delay between attempts in seconds
+
+        Returns:
+            httpx.Response: Completion response
+        """
+        payload = self._prepare_completion_request(await self.get_model(), system_content, user_content)
+        # Cached per server, equal model names on different servers may be different models
+        cache_provider = f"{self.provider}:{self.base_url}"
+        if self.cache is not None:
+            cached = await self.cache.aget_response(cache_provider, payload, self.completions_url)
+            if cached is not None:
+                return cached
+
+        response = await self.limiter.call(
+            lambda: self.http.post(self.completions_url, headers=self._get_headers(), json=payload),
+            max_attempts=max_attempts,
+            delay=delay,
+        )
+
+        if self.cache is not None:
+            await self.cache.aput_response(cache_provider, payload, response)
+        return response
+
+    async def generate_response(
+        self,
+        system_content: Optional[str],
+        user_content: str,
+        max_attempts: int = 10,
+        delay: int = 3,
+    ) -> Optional[httpx.Response]:
+        """
+        Send request and get response in one call.
+
+        Args:
+            system_content: Optional system message content
+            user_content: User message content
+            max_attempts: Maximum number of attempts to get the response
+            delay: Base delay between attempts in seconds
+
+        Returns:
+            Optional[httpx.Response]: Response if successful, None otherwise
+        """
+        try:
+            request = await self.send_request(system_content, user_content, max_attempts, delay)
+        except (CircuitOpenError, httpx.HTTPError, RuntimeError) as e:
+            print(f"{self.provider} request failed: {e}")
+            return None
+        if request.is_error:
+            print(f"{self.provider} request failed: {request.status_code} {request.text}")
+            return None
+        return request
+
+    async def generate_batch(
+        self,
+        prompts: Sequence[Tuple[Optional[str], str]],
+        concurrency: int = LM_STUDIO_BATCH_CONCURRENCY,
+    ) -> List[Optional[httpx.Response]]:
+        """
+        Send many prompts concurrently over the pooled connections.
+
+        Args:
+            prompts: (system content, user content) pairs
+            concurrency: Maximum number of requests in flight
+
+        Returns:
+            List[Optional[httpx.Response]]: Responses in prompt order, None for failed prompts
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(system_content: Optional[str], user_content: str) -> Optional[httpx.Response]:
+            async with semaphore:
+                return await self.generate_response(system_content, user_content)
+
+        return await asyncio.gather(*(send(system_content, user_content) for system_content, user_content in prompts))
+
+    async def stream_response(self, system_content: Optional[str], user_content: str) -> AsyncIterator[str]:
+        """
+        Stream the answer to a prompt as it is generated.
+
+        Streams bypass the response cache, the retries and the circuit breaker, the rate limit still applies.
+
+        Args:
+            system_content: Optional system message content
+            user_content: User message content
+
+        Yields:
+            str: Text fragments of the answer
+        """
+        payload = self._prepare_completion_request(await self.get_model(), system_content, user_content, stream=True)
+        await self.limiter.bucket.acquire()
+        async with self.http.stream("POST", self.completions_url, headers=self._get_headers(), json=payload) as response:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                # Server-sent events: 'data: {chunk}' lines, terminated by 'data: [DONE]'
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                text = choices[0].get("delta", {}).get("content")
+                if text:
+                    yield text
+
+
+if __name__ == '__main__':
+    # This block demonstrates how to use the LMStudioClient against a local server.
+    try:
+        client = LMStudioClient(os.environ.get("LM_STUDIO_URL", LM_STUDIO_URL), os.environ.get("LM_STUDIO_MODEL"))
+
+        system_content = "You are a helpful assistant."
+        user_content = "Tell me a short story about a robot."
+
+        async def main():
+            print("\nStreaming response from the local server...\n")
+            async for text in client.stream_response(system_content, user_content):
+                print(text, end="", flush=True)
+            print()
+            await HTTPTransport.aclose()
+
+        asyncio.run(main())
+
+    except (KeyboardInterrupt, EOFError):
+        print("\nOperation cancelled by user.")
+    except Exception as e:
+        print(f"\nAn unexpected error occurred: {e}")
@@ -0,0 +1,157 @@
+"""Concurrent polling of many long-running operations with adaptive intervals."""
+import asyncio
+import heapq
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+OPERATION_MIN_INTERVAL = float(os.environ.get("OPERATION_MIN_INTERVAL", 0.5))
+OPERATION_MAX_INTERVAL = float(os.environ.get("OPERATION_MAX_INTERVAL", 10))
+OPERATION_POLL_CONCURRENCY = int(os.environ.get("OPERATION_POLL_CONCURRENCY", 32))
+OPERATION_TIMEOUT = float(os.environ.get("OPERATION_TIMEOUT", 600))
+
+# Coroutine fetching the current state of an operation by ID
+OperationFetcher = Callable[[str], Awaitable[dict]]
+
+
+@dataclass(order=True)
+class _Pending:
+    next_poll: float
+    operation_id: str = field(compare=False)
+    submitted: float = field(compare=False)
+    deadline: float = field(compare=False)
+    interval: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class OperationPoller:
+    """
+    Waits for many operations at once with one polling task.
+
+    The first poll of an operation is scheduled after the typical completion
+    time seen so far, every unsuccessful poll backs its next one off by half,
+    so short operations are picked up quickly and slow ones are not hammered.
+    """
+
+    def __init__(
+        self,
+        fetch: OperationFetcher,
+        min_interval: float = OPERATION_MIN_INTERVAL,
+        max_interval: float = OPERATION_MAX_INTERVAL,
+        concurrency: int = OPERATION_POLL_CONCURRENCY,
+    ):
+        """
+        Initialize operation poller.
+
+        Args:
+            fetch: Coroutine function returning the operation JSON for an ID
+            min_interval: Shortest delay between two polls of an operation
+            max_interval: Longest delay between two polls of an operation
+            concurrency: Polls in flight at once
+        """
+        self._fetch = fetch
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.concurrency = concurrency
+        self._queue: List[_Pending] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Moving average of the completion time, the first poll is aimed at it
+        self.latency: Optional[float] = None
+
+    @property
+    def outstanding(self) -> int:
+        return len(self._queue)
+
+    async def wait(self, operation_id: str, timeout: float = OPERATION_TIMEOUT) -> Optional[dict]:
+        """
+        Wait for an operation to finish.
+
+        Args:
+            operation_id: Operation ID
+            timeout: Seconds to wait before giving up
+
+        Returns:
+            Optional[dict]: The finished operation, None if it did not finish in time
+        """
+        now = time.monotonic()
+        first_poll = max(self.min_interval, 0.8 * self.latency) if self.latency else self.min_interval
+        pending = _Pending(
+            next_poll=now + first_poll,
+            operation_id=operation_id,
+            submitted=now,
+            deadline=now + timeout,
+            interval=self.min_interval,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        heapq.heappush(self._queue, pending)
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return await pending.future
+
+    def _due(self) -> List[_Pending]:
+        now = time.monotonic()
+        due = []
+        while self._queue and self._queue[0].next_poll <= now:
+            due.append(heapq.heappop(self._queue))
+        return due
+
+    async def _poll(self, pending: _Pending, semaphore: asyncio.Semaphore) -> None:
+        if pending.future.done():
+            return
+        try:
+            async with semaphore:
+                operation = await self._fetch(pending.operation_id)
+        except Exception as e:
+            print(f"Polling operation {pending.operation_id} failed: {e}")
+            operation = None
+
+        now = time.monotonic()
+        if operation is not None and operation.get("done"):
+            elapsed = now - pending.submitted
+            self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+            pending.future.set_result(operation)
+        elif now >= pending.deadline:
+            print(f"Operation {pending.operation_id} did not finish in time")
+            pending.future.set_result(None)
+        else:
+            pending.interval = min(self.max_interval, pending.interval * 1.5)
+            pending.next_poll = min(now + pending.interval, pending.deadline)
+            heapq.heappush(self._queue, pending)
+
+    async def _run(self) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        while self._queue:
+            due = self._due()
+            if due:
+                await asyncio.gather(*(self._poll(pending, semaphore) for pending in due))
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._queue[0].next_poll - time.monotonic())
+            except asyncio.TimeoutError:
+                pass
+
+
+_pollers: Dict[str, OperationPoller] = {}
+
+
+def get_operation_poller(key: str, fetch: OperationFetcher) -> OperationPoller:
+    """
+    Shared poller per account, created on first use.
+
+    Args:
+        key: Account the operations belong to, e.g. the folder ID, not a rotating token
+        fetch: Operation fetcher with the caller's credentials, replaces the poller's so rotated tokens are picked up
+
+    Returns:
+        OperationPoller: Poller of the account
+    """
+    poller = _pollers.get(key)
+    if poller is None:
+        poller = _pollers[key] = OperationPoller(fetch)
+    else:
+        poller._fetch = fetch
+    return poller
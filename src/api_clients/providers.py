@@ -0,0 +1,282 @@
+"""Common interface of the model providers and the registry the app picks them from."""
+import os
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+import httpx
+
+from .yandex_gpt import YandexGPTClient
+from .giga_chat import GigaChatClient
+from .lm_studio import LMStudioClient, LM_STUDIO_URL, OPENAI_URL, OPENAI_MODEL, LM_STUDIO_BATCH_CONCURRENCY
+from .response_cache import ResponseCache, is_cached
+
+PROVIDER_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 16))
+# Requests in flight in YandexGPT async mode, waiting operations hold no connection
+YANDEXGPT_ASYNC_CONCURRENCY = int(os.environ.get("YANDEXGPT_ASYNC_CONCURRENCY", 256))
+
+# Price per 1000 input and output tokens, in the currency of the provider's bill; 0 leaves cost unreported
+PROVIDER_PRICES: Dict[str, Tuple[float, float]] = {
+    name: (
+        float(os.environ.get(f"{prefix}_PRICE_INPUT", 0)),
+        float(os.environ.get(f"{prefix}_PRICE_OUTPUT", 0)),
+    )
+    for name, prefix in (("yandexGPT", "YANDEXGPT"), ("gigaChat", "GIGACHAT"), ("chatGPT", "CHATGPT"), ("lmStudio", "LM_STUDIO"))
+}
+
+
+class Usage(NamedTuple):
+    """Tokens billed for one completion."""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class Provider(ABC):
+    """
+    Model backend as seen by a batch run.
+
+    Subclasses wrap a client and know how to read its responses, so the batch
+    engine, response cache, rate limiter and job metrics treat every backend
+    alike. Register them with `register_provider` to make them selectable.
+    """
+
+    name: str = ""
+    # Whether the base description is sent as the system message, otherwise it opens the user prompt
+    system_message: bool = True
+    supports_async_mode: bool = False
+    # Whether requests use temperature 0, so a repeated prompt may be answered from the response cache by default
+    deterministic: bool = True
+
+    def __init__(self, client: Any, concurrency: int = PROVIDER_CONCURRENCY):
+        """
+        Initialize provider.
+
+        Args:
+            client: API client of the backend
+            concurrency: Requests a batch keeps in flight
+        """
+        self.client = client
+        self.concurrency = concurrency
+
+    @classmethod
+    @abstractmethod
+    def create(cls, settings: Any, cache: Optional[ResponseCache] = None, async_mode: bool = False) -> "Provider":
+        """
+        Create the provider from the service settings.
+
+        Args:
+            settings: Settings with the credentials and endpoints
+            cache: Optional response cache
+            async_mode: Use the provider's asynchronous API, if it has one
+
+        Returns:
+            Provider: Ready to submit prompts
+        """
+
+    def split_description(self, base_description: str) -> Tuple[Optional[str], str]:
+        """System message and the description the user prompt opens with."""
+        if self.system_message:
+            return base_description, "  "
+        return None, base_description
+
+    @abstractmethod
+    async def submit(self, system_content: Optional[str], user_content: str) -> Optional[httpx.Response]:
+        """Send one prompt, None if it failed."""
+
+    async def submit_batch(self, prompts: Sequence[Tuple[Optional[str], str]], concurrency: Optional[int] = None) -> List[Optional[httpx.Response]]:
+        """
+        Send many prompts concurrently.
+
+        Args:
+            prompts: (system content, user content) pairs
+            concurrency: Requests in flight, the provider's own by default
+
+        Returns:
+            List[Optional[httpx.Response]]: Responses in prompt order, None for failed prompts
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def submit(system_content: Optional[str], user_content: str) -> Optional[httpx.Response]:
+            async with semaphore:
+                return await self.submit(system_content, user_content)
+
+        return await asyncio.gather(*(submit(system_content, user_content) for system_content, user_content in prompts))
+
+    async def stream(self, system_content: Optional[str], user_content: str) -> AsyncIterator[str]:
+        """Answer text fragments of one prompt as they are generated."""
+        async for text in self.client.stream_response(system_content, user_content):
+            yield text
+
+    @abstractmethod
+    def parse(self, data: Dict[str, Any]) -> str:
+        """Answer text of a response."""
+
+    @abstractmethod
+    def model_version(self, data: Dict[str, Any]) -> str:
+        """Model version of a response, prefixed with the provider name."""
+
+    def usage(self, data: Dict[str, Any]) -> Usage:
+        """Tokens billed for a response."""
+        usage = data.get("usage") or {}
+        return Usage(int(usage.get("prompt_tokens", 0)), int(usage.get("completion_tokens", 0)))
+
+    def cost(self, usage: Usage) -> float:
+        input_price, output_price = PROVIDER_PRICES.get(self.name, (0.0, 0.0))
+        return (usage.prompt_tokens * input_price + usage.completion_tokens * output_price) / 1000
+
+    async def answer(self, system_content: Optional[str], user_content: str) -> Optional[Dict[str, Any]]:
+        """
+        Send one prompt and read the response.
+
+        Args:
+            system_content: Optional system message content
+            user_content: User message content
+
+        Returns:
+            Optional[Dict[str, Any]]: Model version, answer, raw response, cache flag, usage and cost; None if it failed
+        """
+        response = await self.submit(system_content, user_content)
+        if not response:
+            return None
+        cached = is_cached(response)
+        data = response.json()
+        usage = self.usage(data)
+        return {'model_version': self.model_version(data),
+                'model_answer': self.parse(data),
+                'response': data,
+                'cached': cached,
+                'usage': usage._asdict(),
+                # Answers from the cache were paid for by an earlier run
+                'cost': 0.0 if cached else self.cost(usage)}
+
+
+PROVIDERS: Dict[str, Type[Provider]] = {}
+
+
+def register_provider(cls: Type[Provider]) -> Type[Provider]:
+    """Class decorator adding a provider to the registry under its name."""
+    PROVIDERS[cls.name] = cls
+    return cls
+
+
+def create_provider(name: str, settings: Any, cache: Optional[ResponseCache] = None, async_mode: bool = False) -> Provider:
+    """
+    Create a registered provider.
+
+    Args:
+        name: Provider name, e.g. 'yandexGPT'
+        settings: Settings with the credentials and endpoints
+        cache: Optional response cache
+        async_mode: Use the provider's asynchronous API, if it has one
+
+    Returns:
+        Provider: Ready to submit prompts
+
+    Raises:
+        KeyError: No provider is registered under the name
+    """
+    return PROVIDERS[name].create(settings, cache=cache, async_mode=async_mode)
+
+
+async def acreate_provider(name: str, settings: Any, cache: Optional[ResponseCache] = None, async_mode: bool = False) -> Provider:
+    """`create_provider` on a worker thread, creating a provider may exchange credentials with blocking calls."""
+    return await asyncio.to_thread(create_provider, name, settings, cache=cache, async_mode=async_mode)
+
+
+@register_provider
+class YandexGPTProvider(Provider):
+    name = "yandexGPT"
+    supports_async_mode = True
+
+    @classmethod
+    def create(cls, settings: Any, cache: Optional[ResponseCache] = None, async_mode: bool = False) -> Provider:
+        # The IAM token is exchanged for the OAuth key by utils, imported here to keep the clients free of it
+        from utils import get_yandex_token
+
+        catalog_id = settings.catalog_id_yandexgpt
+        api_key = get_yandex_token()
+        assert catalog_id and api_key, 'no keys specified...'
+        client = YandexGPTClient(catalog_id, api_key, cache=cache, async_mode=async_mode)
+        return cls(client, YANDEXGPT_ASYNC_CONCURRENCY if async_mode else PROVIDER_CONCURRENCY)
+
+    async def submit(self, system_content: Optional[str], user_content: str) -> Optional[httpx.Response]:
+        return await self.client.generate_response(system_content or "", user_content)
+
+    async def stream(self, system_content: Optional[str], user_content: str) -> AsyncIterator[str]:
+        async for text in self.client.stream_response(system_content or "", user_content):
+            yield text
+
+    def parse(self, data: Dict[str, Any]) -> str:
+        return data['result']['alternatives'][0]['message']['text']
+
+    def model_version(self, data: Dict[str, Any]) -> str:
+        return f'{self.name}-{data["result"]["modelVersion"]}'
+
+    def usage(self, data: Dict[str, Any]) -> Usage:
+        # Token counts come as strings
+        usage = data['result'].get('usage') or {}
+        return Usage(int(usage.get('inputTextTokens', 0)), int(usage.get('completionTokens', 0)))
+
+
+@register_provider
+class GigaChatProvider(Provider):
+    name = "gigaChat"
+    system_message = False
+    # Requests keep the default sampling temperature, repeated prompts are fresh samples
+    deterministic = False
+
+    @classmethod
+    def create(cls, settings: Any, cache: Optional[ResponseCache] = None, async_mode: bool = False) -> Provider:
+        api_key = settings.api_key_gigachat
+        assert api_key, 'no keys specified...'
+        return cls(GigaChatClient(api_key, cache=cache))
+
+    async def submit(self, system_content: Optional[str], user_content: str) -> Optional[httpx.Response]:
+        return await self.client.generate_response(user_content)
+
+    async def stream(self, system_content: Optional[str], user_content: str) -> AsyncIterator[str]:
+        async for text in self.client.stream_response(user_content):
+            yield text
+
+    def parse(self, data: Dict[str, Any]) -> str:
+        return data['choices'][0]['message']['content']
+
+    def model_version(self, data: Dict[str, Any]) -> str:
+        return f'{self.name}-{data["model"]}'
+
+
+@register_provider
+class ChatGPTProvider(Provider):
+    """OpenAI chat completions."""
+    name = "chatGPT"
+
+    @classmethod
+    def create(cls, settings: Any, cache: Optional[ResponseCache] = None, async_mode: bool = False) -> Provider:
+        api_key = settings.api_key_chatgpt
+        assert api_key, 'no keys specified...'
+        client = LMStudioClient(settings.chatgpt_url or OPENAI_URL, settings.chatgpt_model or OPENAI_MODEL, api_key, cache=cache, provider=cls.name)
+        return cls(client)
+
+    async def submit(self, system_content: Optional[str], user_content: str) -> Optional[httpx.Response]:
+        return await self.client.generate_response(system_content, user_content)
+
+    async def submit_batch(self, prompts: Sequence[Tuple[Optional[str], str]], concurrency: Optional[int] = None) -> List[Optional[httpx.Response]]:
+        return await self.client.generate_batch(prompts, concurrency or self.concurrency)
+
+    def parse(self, data: Dict[str, Any]) -> str:
+        return data['choices'][0]['message']['content']
+
+    def model_version(self, data: Dict[str, Any]) -> str:
+        # Local model IDs look like 'publisher/name', which would turn into a folder in the file name
+        return f'{self.name}-{data["model"].replace("/", "_")}'
+
+
+@register_provider
+class LMStudioProvider(ChatGPTProvider):
+    """Local OpenAI-compatible server: LM Studio, llama.cpp or vLLM."""
+    name = "lmStudio"
+
+    @classmethod
+    def create(cls, settings: Any, cache: Optional[ResponseCache] = None, async_mode: bool = False) -> Provider:
+        client = LMStudioClient(settings.lm_studio_url or LM_STUDIO_URL, settings.lm_studio_model, cache=cache)
+        return cls(client, LM_STUDIO_BATCH_CONCURRENCY)
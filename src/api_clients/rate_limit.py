@@ -0,0 +1,314 @@
+"""Adaptive rate limiting, retries with backoff and circuit breaking for provider calls."""
+import asyncio
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+# Requests per second allowed per provider and credential, halved on every 429 and slowly raised again
+RATE_LIMIT_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "yandexGPT": {
+        "rate": float(os.environ.get("YANDEXGPT_RATE_LIMIT", 10)),
+        "burst": float(os.environ.get("YANDEXGPT_RATE_BURST", 10)),
+    },
+    "gigaChat": {
+        "rate": float(os.environ.get("GIGACHAT_RATE_LIMIT", 5)),
+        "burst": float(os.environ.get("GIGACHAT_RATE_BURST", 5)),
+    },
+    "chatGPT": {
+        "rate": float(os.environ.get("CHATGPT_RATE_LIMIT", 50)),
+        "burst": float(os.environ.get("CHATGPT_RATE_BURST", 50)),
+    },
+    # Local servers have no quota, the concurrency limit is what keeps them busy but not flooded
+    "lmStudio": {
+        "rate": float(os.environ.get("LM_STUDIO_RATE_LIMIT", 1000)),
+        "burst": float(os.environ.get("LM_STUDIO_RATE_BURST", 1000)),
+    },
+}
+
+DEFAULT_RATE_LIMIT: Dict[str, Any] = {
+    "rate": 10.0,
+    "burst": 10.0,
+}
+
+# Statuses worth another attempt, 429 additionally slows the bucket down
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_MAX_DELAY = float(os.environ.get("RETRY_MAX_DELAY", 60))
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get("CIRCUIT_RESET_TIMEOUT", 30))
+CIRCUIT_MAX_RESET_TIMEOUT = float(os.environ.get("CIRCUIT_MAX_RESET_TIMEOUT", 300))
+# Seconds a call waits for an open circuit before giving up
+CIRCUIT_MAX_WAIT = float(os.environ.get("CIRCUIT_MAX_WAIT", 600))
+
+
+class CircuitOpenError(Exception):
+    """The provider keeps failing, calls are refused until it recovers."""
+
+
+def parse_retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds to wait from a Retry-After header in seconds or as an HTTP date."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float = RETRY_MAX_DELAY) -> float:
+    """Exponential backoff with full jitter for the given retry attempt (0-based)."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+class TokenBucket:
+    """
+    Token bucket whose rate adapts to the provider.
+
+    Callers reserve a token and sleep until it is due, so waiting requests are
+    released evenly. A 429 pauses the bucket and halves the rate, every
+    success raises it again by a small step up to the configured rate.
+    """
+
+    def __init__(self, rate: float, burst: float, min_rate: float = 0.1):
+        """
+        Initialize token bucket.
+
+        Args:
+            rate: Maximum requests per second
+            burst: Requests allowed at once after an idle period
+            min_rate: Lower bound the rate is never reduced below
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min(min_rate, rate)
+        self.tokens = burst
+        # Time the token count refers to, lies in the future while the bucket is paused
+        self.updated = time.monotonic()
+        self._slowed_at = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token, returns the seconds to wait before using it."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        ready_at = self.updated + max(0.0, -self.tokens) / self.rate
+        return max(0.0, ready_at - now)
+
+    async def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def penalize(self, pause: float) -> None:
+        """Slow down after a 429: no tokens for `pause` seconds, then at half the rate."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+        self.updated = max(self.updated, now + pause)
+        # Requests throttled together count once, so a burst of 429s halves the rate only once
+        if now - self._slowed_at >= max(pause, 1.0):
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._slowed_at = now
+
+    def reward(self) -> None:
+        """Recover the rate after a successful call."""
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 50)
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a provider after repeated failures.
+
+    After `failure_threshold` failures in a row the circuit opens for
+    `reset_timeout` seconds, then a single probe call is let through. A failed
+    probe opens it again for twice as long, a successful one closes it.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+        max_reset_timeout: float = CIRCUIT_MAX_RESET_TIMEOUT,
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_until: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_until is None:
+            return "closed"
+        return "open" if time.monotonic() < self.opened_until else "half_open"
+
+    async def wait(self, max_wait: float = CIRCUIT_MAX_WAIT) -> bool:
+        """
+        Wait until a call may be made.
+
+        Args:
+            max_wait: Seconds to wait for an open circuit
+
+        Returns:
+            bool: Whether the call is the probe of a half open circuit
+
+        Raises:
+            CircuitOpenError: The circuit stays open for longer than `max_wait`
+        """
+        deadline = time.monotonic() + max_wait
+        while self.opened_until is not None:
+            now = time.monotonic()
+            if now >= self.opened_until and not self.probing:
+                self.probing = True
+                return True
+            # Open, or half open with another call probing
+            resume_at = max(self.opened_until, now + 0.5)
+            if resume_at > deadline:
+                raise CircuitOpenError(f"Circuit open, retry in {self.opened_until - now:.0f}s")
+            await asyncio.sleep(resume_at - now)
+        return False
+
+    def record_success(self) -> None:
+        if self.opened_until is not None:
+            print("Circuit closed, provider recovered")
+        self.failures = 0
+        self.opened_until = None
+        self.probing = False
+        self.reset_timeout = self.base_reset_timeout
+
+    def record_failure(self) -> None:
+        if self.probing:
+            self.probing = False
+            self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            self.opened_until = time.monotonic() + self.reset_timeout
+            return
+        self.failures += 1
+        if self.failures >= self.failure_threshold and self.opened_until is None:
+            print(f"Circuit opened after {self.failures} failures for {self.reset_timeout:g}s")
+            self.opened_until = time.monotonic() + self.reset_timeout
+
+
+class ProviderLimiter:
+    """Rate limit, retry policy and circuit breaker of one provider credential."""
+
+    def __init__(self, name: str, rate: float, burst: float):
+        """
+        Initialize provider limiter.
+
+        Args:
+            name: Provider name used in log messages
+            rate: Maximum requests per second
+            burst: Requests allowed at once after an idle period
+        """
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker()
+
+    async def call(
+        self,
+        send: Callable[[], Awaitable[httpx.Response]],
+        max_attempts: int = 5,
+        delay: float = 1.0,
+    ) -> httpx.Response:
+        """
+        Send a request under the limiter, retrying transient failures.
+
+        Args:
+            send: Coroutine function sending the request once
+            max_attempts: Maximum number of attempts
+            delay: Base delay of the exponential backoff in seconds
+
+        Returns:
+            httpx.Response: First non-retryable response, or the last one once attempts are used up
+
+        Raises:
+            CircuitOpenError: The provider is failing and does not recover in time
+            httpx.TransportError: The last attempt failed on the network level
+        """
+        response: Optional[httpx.Response] = None
+        for attempt in range(max_attempts):
+            probe = await self.breaker.wait()
+            retry_after = None
+            try:
+                await self.bucket.acquire()
+                response = await send()
+            except asyncio.CancelledError:
+                if probe:
+                    # Let the next call probe instead
+                    self.breaker.probing = False
+                raise
+            except httpx.TransportError as e:
+                self.breaker.record_failure()
+                if attempt + 1 == max_attempts:
+                    raise
+                reason = f"{type(e).__name__}: {e}"
+            except Exception:
+                # Not retried, but counted, and a failed probe must not keep the circuit half open
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    if not response.is_error:
+                        self.bucket.reward()
+                    return response
+                if response.status_code == 429:
+                    # Throttled but alive, the bucket slows down instead of the breaker opening
+                    retry_after = parse_retry_after(response)
+                    self.breaker.record_success()
+                    self.bucket.penalize(retry_after if retry_after is not None else delay)
+                else:
+                    self.breaker.record_failure()
+                if attempt + 1 == max_attempts:
+                    return response
+                reason = f"status {response.status_code}"
+
+            wait = max(retry_after or 0.0, backoff_delay(attempt, delay))
+            print(f"{self.name} request failed ({reason}), attempt {attempt + 1}/{max_attempts}, retrying in {wait:.1f}s")
+            await asyncio.sleep(wait)
+        return response
+
+
+class _RateLimits:
+    """Lazily creates one limiter per provider and credential."""
+
+    def __init__(self):
+        self._limiters: Dict[Tuple[str, str], ProviderLimiter] = {}
+
+    def get(self, provider: str, credential: str) -> ProviderLimiter:
+        """
+        Get the shared limiter of a provider credential.
+
+        Args:
+            provider: Provider name, e.g. 'yandexGPT' or 'gigaChat'
+            credential: Key the provider counts its quota on, e.g. the folder ID or authorization key
+
+        Returns:
+            ProviderLimiter: Limiter shared by all clients using the credential
+        """
+        limiter = self._limiters.get((provider, credential))
+        if limiter is None:
+            settings = RATE_LIMIT_SETTINGS.get(provider, DEFAULT_RATE_LIMIT)
+            limiter = ProviderLimiter(provider, settings["rate"], settings["burst"])
+            self._limiters[(provider, credential)] = limiter
+        return limiter
+
+
+RateLimits = _RateLimits()
@@ -0,0 +1,172 @@
+"""Persistent cache of model responses, so repeated prompts are not paid for twice."""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", "./cache/responses.sqlite3")
+# Seconds an answer is reused, 30 days by default
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 30 * 24 * 3600))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 1_000_000))
+# Inserts between two eviction passes
+RESPONSE_CACHE_EVICT_EVERY = 1000
+
+
+class ResponseCache:
+    """
+    SQLite store of successful completion responses.
+
+    Entries are keyed on the provider and the full request payload (model,
+    completion options and messages), expire after `ttl` seconds and the
+    least recently used ones are dropped beyond `max_entries`.
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        """
+        Initialize response cache.
+
+        Args:
+            path: SQLite database file, ':memory:' for a process-local cache
+            ttl: Seconds an entry stays valid
+            max_entries: Number of entries kept
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, status_code INTEGER, content BLOB,"
+                " expires_at REAL, used_at REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+            self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def make_key(provider: str, payload: Dict[str, Any]) -> str:
+        """Digest of the provider and the canonical JSON of the request payload."""
+        canonical = json.dumps({"provider": provider, "payload": payload}, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[int, bytes]]:
+        """Status code and body of a cached response, None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT status_code, content FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                self.connection.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+        return row
+
+    def set(self, key: str, status_code: int, content: bytes) -> None:
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, status_code, content, now + self.ttl, now),
+            )
+            self._inserts += 1
+            if self._inserts % RESPONSE_CACHE_EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self.connection.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        self.connection.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def get_response(self, provider: str, payload: Dict[str, Any], url: str) -> Optional[httpx.Response]:
+        """
+        Look up the response to a request.
+
+        Args:
+            provider: Provider name, e.g. 'yandexGPT'
+            payload: JSON payload of the completion request
+            url: Request URL, attached to the rebuilt response
+
+        Returns:
+            Optional[httpx.Response]: Cached response marked with `extensions['from_cache']`, None on a miss
+        """
+        row = self.get(self.make_key(provider, payload))
+        if row is None:
+            return None
+        status_code, content = row
+        return httpx.Response(
+            status_code,
+            content=content,
+            headers={"Content-Type": "application/json"},
+            request=httpx.Request("POST", url),
+            extensions={"from_cache": True},
+        )
+
+    def put_response(self, provider: str, payload: Dict[str, Any], response: httpx.Response) -> None:
+        """Store a successful response, errors are never cached."""
+        if not response.is_error:
+            self.set(self.make_key(provider, payload), response.status_code, response.content)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Lookups are serialized by the lock anyway, one thread keeps them off the event loop
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+        return self._executor
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run a blocking cache call on the cache thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def aget_response(self, provider: str, payload: Dict[str, Any], url: str) -> Optional[httpx.Response]:
+        return await self.run(self.get_response, provider, payload, url)
+
+    async def aput_response(self, provider: str, payload: Dict[str, Any], response: httpx.Response) -> None:
+        await self.run(self.put_response, provider, payload, response)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Shared response cache at RESPONSE_CACHE_PATH, opened on first use."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
+
+
+def is_cached(response: httpx.Response) -> bool:
+    """Whether a response was served from the cache instead of the provider."""
+    return bool(response.extensions.get("from_cache"))
@@ -0,0 +1,73 @@
+"""Cached OAuth access tokens refreshed ahead of expiry."""
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional, Tuple
+
+# Fetch coroutine returning the access token and its expiry as a unix timestamp in seconds
+TokenFetcher = Callable[[], Awaitable[Tuple[str, float]]]
+
+
+class TokenManager:
+    """
+    Caches an access token until shortly before it expires.
+
+    Concurrent callers share one in-flight refresh. When the token enters the
+    refresh margin it is still handed out while a new one is fetched in the background.
+    """
+
+    def __init__(self, fetch: TokenFetcher, refresh_margin: float = 120, expiry_margin: float = 10):
+        """
+        Initialize token manager.
+
+        Args:
+            fetch: Coroutine function fetching a new (token, expires_at) pair
+            refresh_margin: Seconds before expiry to start a background refresh
+            expiry_margin: Seconds before expiry after which the token is not used anymore
+        """
+        self._fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.expiry_margin = expiry_margin
+        self._token: Optional[str] = None
+        self._expires_at: float = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def _do_refresh(self) -> str:
+        token, expires_at = await self._fetch()
+        self._token, self._expires_at = token, expires_at
+        return token
+
+    @staticmethod
+    def _report_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Token refresh failed: {task.exception()}")
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._do_refresh())
+            self._refresh_task.add_done_callback(self._report_failure)
+        return self._refresh_task
+
+    async def refresh(self) -> str:
+        """Fetch a new token, joining a refresh already in flight."""
+        # Shield so a cancelled caller does not cancel the refresh shared with others
+        return await asyncio.shield(self._start_refresh())
+
+    async def get_token(self) -> str:
+        """
+        Get a valid access token.
+
+        Returns:
+            str: Cached token, or a freshly fetched one if the cached token expired
+        """
+        now = time.time()
+        if self._token is None or now >= self._expires_at - self.expiry_margin:
+            return await self.refresh()
+        if now >= self._expires_at - self.refresh_margin:
+            self._start_refresh()
+        return self._token
+
+    def invalidate(self, token: str) -> None:
+        """Drop the cached token after the API rejected it, unless it was already replaced."""
+        if self._token == token:
+            self._token = None
+            self._expires_at = 0.0
@@ -0,0 +1,89 @@
+"""Shared async HTTP transport with keep-alive connection pools per provider."""
+import os
+from typing import Dict, Any, Optional, Tuple
+
+import httpx
+
+GIGACHAT_CERTIFICATE = "./api_clients/certificate/russian_trusted_root_ca_pem.crt"
+
+# Per-provider pool settings, connection limits can be tuned from the environment
+PROVIDER_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "yandexGPT": {
+        "http2": True,
+        "max_connections": int(os.environ.get("YANDEXGPT_MAX_CONNECTIONS", 100)),
+        "verify": True,
+    },
+    "gigaChat": {
+        "http2": False,
+        "max_connections": int(os.environ.get("GIGACHAT_MAX_CONNECTIONS", 50)),
+        "verify": GIGACHAT_CERTIFICATE,
+    },
+    "chatGPT": {
+        "http2": True,
+        "max_connections": int(os.environ.get("CHATGPT_MAX_CONNECTIONS", 50)),
+        "verify": True,
+    },
+    # Local servers answer slowly on long generations, so they get a longer read timeout
+    "lmStudio": {
+        "http2": False,
+        "max_connections": int(os.environ.get("LM_STUDIO_MAX_CONNECTIONS", 32)),
+        "verify": True,
+        "timeout": float(os.environ.get("LM_STUDIO_TIMEOUT", 600)),
+    },
+}
+
+DEFAULT_SETTINGS: Dict[str, Any] = {
+    "http2": False,
+    "max_connections": 100,
+    "verify": True,
+}
+
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 60))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 10))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30))
+
+
+class _HTTPTransport:
+    """Lazily creates and caches one pooled `httpx.AsyncClient` per provider and timeout."""
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, Optional[float]], httpx.AsyncClient] = {}
+
+    def get_client(self, provider: str, timeout: Optional[float] = None) -> httpx.AsyncClient:
+        """
+        Get the shared client of a provider.
+
+        Args:
+            provider: Provider name, e.g. 'yandexGPT' or 'gigaChat'
+            timeout: Optional read/write timeout overriding the provider's and HTTP_TIMEOUT,
+                a client asking for another timeout than earlier ones gets a pool of its own
+
+        Returns:
+            httpx.AsyncClient: Client with a keep-alive connection pool
+        """
+        key = (provider, timeout)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            settings = PROVIDER_SETTINGS.get(provider, DEFAULT_SETTINGS)
+            max_connections = settings["max_connections"]
+            client = httpx.AsyncClient(
+                http2=settings["http2"],
+                verify=settings["verify"],
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(timeout or settings.get("timeout", HTTP_TIMEOUT), connect=HTTP_CONNECT_TIMEOUT),
+            )
+            self._clients[key] = client
+        return client
+
+    async def aclose(self) -> None:
+        """Close every pooled client."""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+HTTPTransport = _HTTPTransport()
@@ -1,28 +1,56 @@
 """YandexGPT API client for handling requests and responses."""
 import os
-import requests
+import asyncio
 import json
-import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator
 from getpass import getpass
 
+import httpx
+
+from .transport import HTTPTransport
+from .response_cache import ResponseCache
+from .rate_limit import CircuitOpenError, ProviderLimiter, RateLimits
+from .operations import OperationPoller, get_operation_poller
+
 
 
 class YandexGPTClient:
     """Client for interacting with YandexGPT API."""
     
     BASE_URL = "https://llm.api.cloud.yandex.net/foundationModels/v1"
+    OPERATIONS_URL = "https://llm.api.cloud.yandex.net/operations"
+    PROVIDER = "yandexGPT"
     
-    def __init__(self, catalog_id: str, api_key: str):
+    def __init__(self, catalog_id: str, api_key: str, cache: Optional[ResponseCache] = None, async_mode: bool = False):
         """
         Initialize YandexGPT client.
         
         Args:
             catalog_id: Yandex Cloud Catalog ID
             api_key: Yandex Cloud Service Account API Key
+            cache: Optional response cache, identical requests are answered from it
+            async_mode: Submit requests to completionAsync and wait for the operations
+                instead of holding a connection per completion
         """
         self.catalog_id = catalog_id
         self.api_key = api_key
+        self.cache = cache
+        self.async_mode = async_mode
+
+    @property
+    def limiter(self) -> ProviderLimiter:
+        """Rate limiter shared by every client of the folder, quotas are counted per folder."""
+        return RateLimits.get(self.PROVIDER, self.catalog_id)
+
+    @property
+    def poller(self) -> OperationPoller:
+        """Operation poller shared by every client of the folder, it polls with the newest client's IAM token."""
+        return get_operation_poller(self.catalog_id, self._fetch_operation)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared pooled HTTP client of the provider."""
+        return HTTPTransport.get_client(self.PROVIDER)
         
     def _get_headers(self) -> Dict[str, str]:
         """Get headers for API requests."""
@@ -31,12 +59,12 @@ class YandexGPTClient:
             "Authorization": f"Bearer {self.api_key}"
         }
         
-    def _prepare_completion_request(self, system_content: str, user_content: str) -> Dict[str, Any]:
+    def _prepare_completion_request(self, system_content: str, user_content: str, stream: bool = False) -> Dict[str, Any]:
         """Prepare the completion request payload."""
         return {
             "modelUri": f"gpt://{self.catalog_id}/yandexgpt/latest",
             "completionOptions": {
-                "stream": False,
+                "stream": stream,
                 "temperature": 0,
                 "maxTokens": "2000"
             },
@@ -46,26 +74,114 @@ class YandexGPTClient:
             ]
         }
         
-    def send_request(self, system_content: str, user_content: str) -> Optional[str]:
+    async def send_request(self, system_content: str, user_content: str, max_attempts: int = 10, delay: float = 3) -> httpx.Response:
         """
         Send an asynchronous request to YandexGPT.
         
+        Throttled by the shared rate limiter, 429 and 5xx answers are retried with backoff.
+
         Args:
             system_content: System message content
             user_content: User message content
+            max_attempts: Maximum number of attempts
+            delay: Base delay between attempts in seconds
             
         Returns:
-            Optional[str]: Request ID if successful, None otherwise
+            httpx.Response: Completion response
         """
-        response = requests.post(
-            f"{self.BASE_URL}/completion",
-            headers=self._get_headers(),
-            json=self._prepare_completion_request(system_content, user_content)
+        url = f"{self.BASE_URL}/completion"
+        payload = self._prepare_completion_request(system_content, user_content)
+        if self.cache is not None:
+            cached = await self.cache.aget_response(self.PROVIDER, payload, url)
+            if cached is not None:
+                return cached
+
+        response = await self.limiter.call(
+            lambda: self.http.post(url, headers=self._get_headers(), json=payload),
+            max_attempts=max_attempts,
+            delay=delay,
         )
-    
+
+        if self.cache is not None:
+            await self.cache.aput_response(self.PROVIDER, payload, response)
         return response
             
-    def get_response(
+    async def stream_response(self, system_content: str, user_content: str) -> AsyncIterator[str]:
+        """
+        Stream the answer to a prompt as it is generated.
+
+        Streams bypass the response cache, the retries and the circuit breaker, the rate limit still applies.
+
+        Args:
+            system_content: System message content
+            user_content: User message content
+
+        Yields:
+            str: Text fragments of the answer
+        """
+        payload = self._prepare_completion_request(system_content, user_content, stream=True)
+        await self.limiter.bucket.acquire()
+        async with self.http.stream("POST", f"{self.BASE_URL}/completion", headers=self._get_headers(), json=payload) as response:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            # One JSON object per line, each with the whole text generated so far
+            text = ""
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                alternatives = json.loads(line)["result"]["alternatives"]
+                current = alternatives[0]["message"]["text"] if alternatives else text
+                if current.startswith(text) and len(current) > len(text):
+                    yield current[len(text):]
+                text = current
+
+    async def send_async_request(self, system_content: str, user_content: str, max_attempts: int = 10, delay: float = 3) -> httpx.Response:
+        """
+        Submit a completion operation to YandexGPT.
+
+        Args:
+            system_content: System message content
+            user_content: User message content
+            max_attempts: Maximum number of attempts
+            delay: Base delay between attempts in seconds
+
+        Returns:
+            httpx.Response: Operation descriptor, its 'id' is passed to get_response
+        """
+        url = f"{self.BASE_URL}/completionAsync"
+        payload = self._prepare_completion_request(system_content, user_content)
+        return await self.limiter.call(
+            lambda: self.http.post(url, headers=self._get_headers(), json=payload),
+            max_attempts=max_attempts,
+            delay=delay,
+        )
+
+    async def _fetch_operation(self, operation_id: str) -> Dict[str, Any]:
+        response = await self.http.get(f"{self.OPERATIONS_URL}/{operation_id}", headers=self._get_headers())
+        if response.status_code == 429 or response.status_code >= 500:
+            # Transient, the poller tries again at its next interval
+            return {"id": operation_id, "done": False}
+        if response.is_error:
+            return {"id": operation_id, "done": True, "error": {"code": response.status_code, "message": response.text}}
+        return response.json()
+
+    async def wait_operation(self, operation_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Wait for a completion operation to finish.
+
+        Args:
+            operation_id: Operation ID from send_async_request
+            timeout: Seconds to wait, OPERATION_TIMEOUT by default
+
+        Returns:
+            Optional[Dict[str, Any]]: The finished operation, None if it did not finish in time
+        """
+        if timeout is None:
+            return await self.poller.wait(operation_id)
+        return await self.poller.wait(operation_id, timeout)
+
+    async def get_response(
         self,
         request_id: str,
         max_attempts: int = 10,
@@ -76,69 +192,88 @@ class YandexGPTClient:
         Get response for a previously sent request.
         
         Args:
-            request_id: Request ID from send_request
+            request_id: Operation ID from send_async_request
             max_attempts: Maximum number of attempts to get the response
-            delay: Delay between attempts in seconds
+            delay: Delay between attempts in seconds, together with max_attempts bounds the wait
             verbose: Whether to print response details
             
         Returns:
             Optional[str]: Response text if successful, None otherwise
         """
-        result_url = f"https://llm.api.cloud.yandex.net/operations/{request_id}"
-        
-        for attempt in range(max_attempts):
-            try:
-                response = requests.get(result_url, headers=self._get_headers())
-                response.raise_for_status()
-                data = response.json()
-                
-                if verbose:
-                    print(f"Attempt {attempt + 1}, Status: {'Done' if data.get('done') else 'In Progress'}")
-                    
-                if data.get("done", False):
-                    if "response" in data:
-                        alternatives = data["response"].get("alternatives", [])
-                        if alternatives:
-                            return alternatives[0].get("message", {}).get("text")
-                    elif "error" in data:
-                        print(f"YandexGPT operation finished with an error: {data['error']}")
-                        return None
-                    return None
-                    
-                time.sleep(delay)
-                
-            except requests.exceptions.RequestException as e:
-                print(f"Error getting response on attempt {attempt + 1}: {e}")
-                if e.response:
-                    print(f"Response body: {e.response.text}")
-                time.sleep(delay)
-                
-        print("Failed to get response after multiple attempts.")
+        data = await self.wait_operation(request_id, timeout=max_attempts * delay)
+        if data is None:
+            print("Failed to get response after multiple attempts.")
+            return None
+        if verbose:
+            print(f"Operation {request_id} done")
+        if "response" in data:
+            alternatives = data["response"].get("alternatives", [])
+            if alternatives:
+                return alternatives[0].get("message", {}).get("text")
+        elif "error" in data:
+            print(f"YandexGPT operation finished with an error: {data['error']}")
         return None
-        
-    def generate_response(
+
+    async def _generate_async(self, system_content: str, user_content: str, max_attempts: int, delay: float) -> Optional[httpx.Response]:
+        """Submit an operation and wait for it, the result is shaped like a /completion response."""
+        url = f"{self.BASE_URL}/completion"
+        payload = self._prepare_completion_request(system_content, user_content)
+        if self.cache is not None:
+            cached = await self.cache.aget_response(self.PROVIDER, payload, url)
+            if cached is not None:
+                return cached
+
+        submitted = await self.send_async_request(system_content, user_content, max_attempts, delay)
+        if submitted.is_error:
+            print(f"YandexGPT request failed: {submitted.status_code} {submitted.text}")
+            return None
+        operation = await self.wait_operation(submitted.json()["id"])
+        if operation is None:
+            return None
+        if "error" in operation:
+            print(f"YandexGPT operation finished with an error: {operation['error']}")
+            return None
+
+        response = httpx.Response(200, json={"result": operation["response"]}, request=httpx.Request("POST", url))
+        if self.cache is not None:
+            # Keyed like the synchronous request, so both modes share cached answers
+            await self.cache.aput_response(self.PROVIDER, payload, response)
+        return response
+
+    async def generate_response(
         self,
         system_content: str,
         user_content: str,
         max_attempts: int = 10,
         delay: int = 3,
         verbose: bool = False
-    ) -> Optional[str]:
+    ) -> Optional[httpx.Response]:
         """
         Send request and get response in one call.
+
+        In async mode the request goes through completionAsync and the operation
+        poller, the returned response has the same shape either way.
         
         Args:
             system_content: System message content
             user_content: User message content
             max_attempts: Maximum number of attempts to get the response
-            delay: Delay between attempts in seconds
+            delay: Base delay between attempts in seconds
             verbose: Whether to print response details
             
         Returns:
-            Optional[str]: Response text if successful, None otherwise
+            Optional[httpx.Response]: Response if successful, None otherwise
         """
-        request = self.send_request(system_content, user_content)
-        if not request:
+        try:
+            if self.async_mode:
+                return await self._generate_async(system_content, user_content, max_attempts, delay)
+            request = await self.send_request(system_content, user_content, max_attempts, delay)
+        except (CircuitOpenError, httpx.HTTPError) as e:
+            print(f"YandexGPT request failed: {e}")
+            return None
+        if request.is_error:
+            if verbose:
+                print(f"YandexGPT request failed: {request.status_code} {request.text}")
             return None
         return request
 
@@ -157,7 +292,7 @@ if __name__ == '__main__':
         user_content = "Tell me a short story about a robot."
         
         print("\nSending request to YandexGPT...")
-        response = client.generate_response(system_content, user_content, verbose=True)
+        response = asyncio.run(client.generate_response(system_content, user_content, verbose=True))
 
         if response:
             print("\n--- Response ---")
@@ -1,15 +1,20 @@
 import os
+import re
 import csv
-from fastapi import FastAPI, Request, Query, Body, HTTPException
+import json
+from fastapi import FastAPI, Request, Query, Body, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import StreamingResponse
-from typing import Optional, Dict
+from typing import Awaitable, Callable, NamedTuple, Optional, Dict, List, Tuple, Union
 from pydantic import BaseModel
 import random
+import asyncio
+import inspect
 
-from utils import generate_scenarios_characters, get_localized_data, construct_prompt, setup_i18n, get_yandex_token, convert_csv, S3Client
-from api_clients import YandexGPTClient, GigaChatClient
+from utils import generate_prompt_data, build_prompt_data, UniqueScenarioSampler, CSVStreamWriter, JoinedCSVStreamWriter, csv_filename, stream_zip, S3Client, error_code, get_settings, run_batch, Job, JobQueue, get_checkpoint_journal, scenario_key, SeedStream, agenerate_prompts_parallel, shutdown_generation_executor
+import utils
+from api_clients import HTTPTransport, PROVIDERS, acreate_provider, get_response_cache
 
 
 app = FastAPI(title="Prompt generator")
@@ -25,6 +30,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("shutdown")
+async def close_clients():
+    await HTTPTransport.aclose()
+    shutdown_generation_executor()
+    S3Client.close()
+
+# Result file formats: file name builder and streaming writer factory.
+# Parquet names are looked up on use, so pyarrow is imported by the first Parquet export only
+EXPORT_FORMATS = {
+    "csv": (csv_filename, lambda sink, lang: CSVStreamWriter(sink)),
+    "parquet": (lambda model_version, lang, run_id=None: utils.parquet_filename(model_version, lang, run_id), lambda sink, lang: utils.ParquetStreamWriter(sink, lang)),
+}
+
+MEDIA_TYPES = {
+    ".csv": "text/csv",
+    ".parquet": "application/vnd.apache.parquet",
+}
+
 # Configure templates
 templates = Jinja2Templates(directory="templates")
 
@@ -41,7 +64,7 @@ class PromptResponse(BaseModel):
     characters: Dict[str, str]
     scenario_info: Dict
 
-def generate_prompt_text(lang: str, description: Optional[str] = None, case1: Optional[str] = None, case2: Optional[str] = None, ending: Optional[str] = "") -> PromptResponse:
+def generate_prompt_text(lang: str, description: Optional[str] = None, case1: Optional[str] = None, case2: Optional[str] = None, ending: Optional[str] = "", rng: Optional[random.Random] = None) -> PromptResponse:
     """
     Helper function to generate prompt text.
     
@@ -51,58 +74,19 @@ def generate_prompt_text(lang: str, description: Optional[str] = None, case1: Op
         case1: Optional custom case 1
         case2: Optional custom case 2
         ending: Optional ending text
+        rng: Random generator of the scenario, the global one by default
         
     Returns:
         PromptResponse: Generated prompt text and character lists
     """
-    # Set up translations
-    _ = setup_i18n(lang)
-
-    dimension = random.choice(["species", "social_value", "gender", "age", "fitness", "utilitarianism", "random"])
-    
-    # Generate pedestrian sets
-    pedestrians_set_1, pedestrians_set_2, scenario_info = generate_scenarios_characters(lang, dimension)
-    
-    # Get all language-specific strings
-    (
-        animals, people,                     # Species groups
-        low_status, neutral_status, high_status,  # Social groups
-        females, males,                      # Gender groups
-        age_pairs, fitness_pairs,           # Paired groups
-        all_chars, plural_forms,            # Character lists
-        text_joins,                         # Text formatting
-        base_description,                   # Base description
-        case1_description,                  # Case 1 description
-        case2_description,                  # Case 2 description
-        case1_header,                       # Case 1 header
-        case2_header                        # Case 2 header
-    ) = get_localized_data(lang)
-    
-    # Use default descriptions if not provided
-    description = description or base_description
-    case1 = case1 or case1_description
-    case2 = case2 or case2_description
-    
-    prompt = construct_prompt(
+    return PromptResponse(**generate_prompt_data(
+        lang=lang,
         description=description,
         case1=case1,
         case2=case2,
-        pedestrians_set_1=pedestrians_set_1,
-        pedestrians_set_2=pedestrians_set_2,
-        case1_header=case1_header,
-        case2_header=case2_header,
         ending=ending,
-        lang=lang
-    )
-
-    return PromptResponse(
-        prompt=prompt,
-        characters={
-            "case1": pedestrians_set_1,
-            "case2": pedestrians_set_2
-        },
-        scenario_info=scenario_info
-    )
+        rng=rng
+    ))
 
 @app.get("/")
 async def generate_prompt(request: Request, lang: str = "en"):
@@ -154,6 +138,292 @@ async def update_prompt(prompt_data: PromptUpdate) -> PromptResponse:
         ending=prompt_data.ending
     )
 
+class ModelSender(NamedTuple):
+    """How a run talks to one model."""
+    send: Callable[[PromptResponse], Awaitable[Optional[dict]]]
+    prompt_options: dict
+    concurrency: int
+
+async def create_sender(model: str, run: dict) -> ModelSender:
+    """
+    Create the provider of a model and the coroutine sending one prompt to it.
+
+    Args:
+        model: Registered provider name
+        run: Request parameters of the run
+
+    Returns:
+        ModelSender: Send coroutine, prompt options the model expects and its number of requests in flight
+    """
+    if model not in PROVIDERS:
+        raise HTTPException(status_code=501, detail=f"Model {model} is not supported yet")
+    # Only providers with an async API use it, runs that fan out to others keep those at their default
+    provider = await acreate_provider(
+        model,
+        get_settings(),
+        cache=get_response_cache() if (PROVIDERS[model].deterministic if run["cache"] is None else run["cache"]) else None,
+        async_mode=run["async_mode"] and PROVIDERS[model].supports_async_mode,
+    )
+
+    system_content, description = provider.split_description(run["base_description"])
+    prompt_options = dict(
+        description=description,
+        case1=run["case1_description"],
+        case2=run["case2_description"],
+        ending=run["ending"],
+    )
+
+    async def send(prompt: PromptResponse) -> Optional[dict]:
+        answer = await provider.answer(system_content, prompt.prompt)
+        if answer is None:
+            return None
+        return dict(answer, prompt=(system_content or '') + prompt.prompt, scenario_info=prompt.scenario_info)
+
+    return ModelSender(send, prompt_options, provider.concurrency)
+
+def fan_out(senders: Dict[str, ModelSender], lang: str) -> Callable[..., Awaitable[Optional[dict]]]:
+    """
+    Send every scenario to several models at once and join their answers.
+
+    The scenario is rendered anew with the prompt options of every model, each
+    model keeps its own limit of requests in flight besides its rate limiter.
+    The send coroutine takes an optional `answered` dict of answer rows by
+    model: models found in it are not asked again, and the answers received
+    are added to it, so the caller can keep them when another model fails.
+
+    Args:
+        senders: Senders by model name, the prompts are generated with the options of the first
+        lang: Language code
+
+    Returns:
+        Callable[..., Awaitable[Optional[dict]]]: Send coroutine of the joined rows, None unless every model answered
+    """
+    models = list(senders)
+    limits = {model: asyncio.Semaphore(sender.concurrency) for model, sender in senders.items()}
+
+    async def ask(model: str, prompt: PromptResponse) -> Optional[dict]:
+        sender = senders[model]
+        if model != models[0]:
+            scenario = (prompt.characters["case1"], prompt.characters["case2"], prompt.scenario_info)
+            prompt = PromptResponse(**build_prompt_data(lang, scenario, **sender.prompt_options))
+        async with limits[model]:
+            return await sender.send(prompt)
+
+    async def send(prompt: PromptResponse, answered: Optional[Dict[str, dict]] = None) -> Optional[dict]:
+        answered = {} if answered is None else answered
+        asked = [model for model in models if model not in answered]
+        for model, row in zip(asked, await asyncio.gather(*(ask(model, prompt) for model in asked), return_exceptions=True)):
+            if isinstance(row, Exception):
+                print(f"{model} request failed: {row}")
+            elif row is not None:
+                answered[model] = row
+        missing = [model for model in models if model not in answered]
+        if missing:
+            # Rows are only useful for comparison with every answer, the others are kept in `answered` for a resume
+            print(f"No answer from {', '.join(missing)}, scenario dropped")
+            return None
+        rows = {model: answered[model] for model in models}
+        return {'model_version': '-'.join(['compare'] + models),
+                'prompt': prompt.prompt,
+                'scenario_info': prompt.scenario_info,
+                'answers': {model: row['model_answer'] for model, row in rows.items()},
+                'model_versions': {model: row['model_version'] for model, row in rows.items()},
+                'response': {model: row['response'] for model, row in rows.items()},
+                'cached': all(row['cached'] for row in rows.values()),
+                'usage': {name: sum(row['usage'][name] for row in rows.values()) for name in ('prompt_tokens', 'completion_tokens')},
+                'cost': sum(row['cost'] for row in rows.values())}
+
+    return send
+
+MODEL_PATTERN = f"^({'|'.join(PROVIDERS)})$"
+
+# Run parameters kept with the job, the prompt texts are only stored in the checkpoint journal
+JOB_PARAMS = ("model", "models", "lang", "seed", "format", "cache", "unique", "async_mode")
+
+async def create_runner(run: dict, resume: bool = False) -> Callable[[Job], Awaitable[None]]:
+    """
+    Build the coroutine executing a batch run.
+
+    Every answered or failed item is written to the checkpoint journal, so a
+    run broken off by a crash, redeploy or provider outage can be resumed
+    without paying for its answers twice.
+
+    Args:
+        run: Request parameters of the run, as stored in the checkpoint journal
+        resume: Continue the journaled run: its answers are replayed into the output files and only missing and failed items are sent
+
+    Returns:
+        Callable[[Job], Awaitable[None]]: Runner to submit to the JobQueue
+    """
+    lang = run["lang"]
+    batch_size = run["batch_size"]
+    seeds = SeedStream(run["seed"])
+    journal = get_checkpoint_journal()
+
+    models = run.get("models") or [run["model"]]
+    senders = {model: await create_sender(model, run) for model in models}
+    prompt_options = senders[models[0]].prompt_options
+    if len(models) == 1:
+        send, concurrency = senders[models[0]].send, senders[models[0]].concurrency
+        formats = EXPORT_FORMATS if run["format"] == "both" else {run["format"]: EXPORT_FORMATS[run["format"]]}
+    else:
+        send = fan_out(senders, lang)
+        # Every model is held to its own concurrency by fan_out, the batch only has to keep all of them busy
+        concurrency = max(sender.concurrency for sender in senders.values())
+        formats = {"csv": (csv_filename, lambda sink, lang: JoinedCSVStreamWriter(sink, models))}
+
+    def generate(index: int) -> PromptResponse:
+        return generate_prompt_text(lang=lang, rng=seeds.scenario_random(index), **prompt_options)
+
+    if run["unique"]:
+        # Workers take indices in order, so the sampler is drawn from in index order as well
+        sampler = UniqueScenarioSampler(lang, rng=seeds.run_random())
+
+        def generate(index: int) -> PromptResponse:
+            return PromptResponse(**build_prompt_data(lang, sampler.sample(), **prompt_options))
+
+    async def runner(job: Job) -> None:
+        # A run still marked as running was killed before it could complete its uploads
+        killed = resume and await journal.run(journal.status, job.id) == "running"
+        await journal.run(journal.start, job.id, run)
+        done_rows, failed_prompts = await journal.run(journal.items, job.id) if resume else ({}, {})
+        if resume:
+            # The files are written anew under the same names, unfinished uploads of the killed run are dropped
+            for filename, upload_id in await journal.run(journal.uploads, job.id) if killed else []:
+                try:
+                    await S3Client.run(S3Client.abort_upload, filename, upload_id)
+                except Exception as e:
+                    print(f"Job {job.id}: upload of {filename} not aborted: {e}")
+            if run["unique"]:
+                for info in [row['scenario_info'] for row in done_rows.values()] + [prompt['scenario_info'] for prompt in failed_prompts.values()]:
+                    sampler.index.add(info)
+            print(f"Job {job.id}: resuming with {len(done_rows)} answers, {len(failed_prompts)} failed and {batch_size - len(done_rows) - len(failed_prompts)} missing items")
+
+        # One (upload, writer, lock) per export format, opened on the first answer
+        outputs = []
+        outputs_lock = asyncio.Lock()
+        # Prompts sent and not answered yet, journaled with their answer
+        prompts: Dict[int, PromptResponse] = {}
+        # Answers of the models that did answer a compare scenario, journaled if another model failed it
+        partial_answers: Dict[int, Dict[str, dict]] = await journal.run(journal.answers, job.id) if resume else {}
+
+        async def write(row: dict) -> None:
+            async with outputs_lock:
+                if not outputs:
+                    # The file name depends on the model version of the first answer
+                    for filename_of, writer_of in formats.values():
+                        # Named after the job as well, so concurrent runs of the same model never share an object
+                        filename = filename_of(row['model_version'], lang, job.id)
+                        upload = await S3Client.astart_upload(filename)
+                        outputs.append((upload, writer_of(upload, lang), asyncio.Lock()))
+                        job.files.append(filename)
+                    job.filename = job.files[0]
+                    job.params['upload_ids'] = [upload.upload_id for upload, _, _ in outputs]
+                    await journal.run(journal.set_uploads, job.id, list(zip(job.files, job.params['upload_ids'])))
+            for upload, writer, lock in outputs:
+                # Rows of a file are buffered in order, a full Parquet row group is compressed on the S3 pool
+                async with lock:
+                    writer.write(row)
+                    if writer.full:
+                        await S3Client.run(writer.flush)
+                    part = upload.take_part()
+                if part is not None:
+                    await S3Client.run(upload.upload_part, *part)
+
+        def checkpointed(generate_item: Callable[[int], Union[PromptResponse, Awaitable[PromptResponse]]]) -> Callable[[int], Awaitable[Tuple[int, PromptResponse]]]:
+            async def generate_checkpointed(index: int) -> Tuple[int, PromptResponse]:
+                # Failed items are sent again with the very prompt they failed with
+                if index in failed_prompts:
+                    prompt = PromptResponse(**failed_prompts[index])
+                else:
+                    prompt = generate_item(index)
+                    if inspect.isawaitable(prompt):
+                        prompt = await prompt
+                prompts[index] = prompt
+                return index, prompt
+            return generate_checkpointed
+
+        # Prompts rendered in the generation process pool, by index until their worker takes them
+        shards = agenerate_prompts_parallel(lang, batch_size, seeds.seed, **prompt_options) if run["parallel"] else None
+        rendered: Dict[int, dict] = {}
+        rendered_until = 0
+        shards_lock = asyncio.Lock()
+        shards_error: Optional[Exception] = None
+
+        async def generate_parallel(index: int) -> PromptResponse:
+            # One batch runs across the shards, the worker reaching the next shard waits for it while the others keep sending
+            nonlocal rendered_until, shards_error
+            async with shards_lock:
+                while index >= rendered_until:
+                    if shards_error is not None:
+                        # The generator is finished once it raised, the items after it fail with its error
+                        raise shards_error
+                    try:
+                        shard = await shards.__anext__()
+                    except Exception as e:
+                        shards_error = e
+                        raise
+                    rendered.update((i, prompt) for i, prompt in enumerate(shard, rendered_until) if i not in done_rows and i not in failed_prompts)
+                    rendered_until += len(shard)
+            return PromptResponse(**rendered.pop(index))
+
+        async def send_item(item: Tuple[int, PromptResponse]) -> Optional[dict]:
+            index, prompt = item
+            if len(models) == 1:
+                return await send(prompt)
+            # Models that answered the scenario before are not asked again
+            return await send(prompt, partial_answers.setdefault(index, {}))
+
+        async def on_result(index: int, row: Optional[dict]) -> None:
+            prompt = prompts.pop(index, None)
+            answers = partial_answers.pop(index, None)
+            if prompt is not None:
+                await journal.run(journal.record, job.id, index, str(scenario_key(prompt.scenario_info, lang)), prompt.dict(), row, answers)
+            if row is None:
+                job.failed += 1
+            else:
+                job.done += 1
+                job.cache_hits += row['cached']
+                job.add_usage(row.get('usage'), row.get('cost', 0.0))
+                if job.response is None:
+                    job.response = row['response']
+                await write(row)
+            JobQueue.store.save(job)
+            if row is None:
+                JobQueue.publish(job, {"type": "failed", "index": index})
+            else:
+                JobQueue.publish(job, {"type": "result", "index": index, "model_version": row['model_version'],
+                                       "answer": row.get('model_answer'), "answers": row.get('answers'),
+                                       "scenario_info": row['scenario_info'], "cached": row['cached']})
+
+        try:
+            for row in done_rows.values():
+                # Answers of the interrupted run were paid for by this job as well
+                job.add_usage(row.get('usage'), row.get('cost', 0.0))
+                job.cache_hits += row.get('cached', False)
+                await write(row)
+            job.done = len(done_rows)
+
+            indices = (index for index in range(batch_size) if index not in done_rows)
+            await run_batch(checkpointed(generate_parallel if run["parallel"] else generate), send_item, batch_size,
+                            concurrency=concurrency, on_result=on_result, collect=False, indices=indices)
+        finally:
+            if shards is not None:
+                await shards.aclose()
+            # Finish the files even if the batch broke off, so answers already paid for are kept
+            for upload, writer, _ in outputs:
+                await S3Client.run(writer.close)
+                await S3Client.run(upload.complete)
+            await journal.run(journal.finish, job.id, "done" if job.done == batch_size else "incomplete")
+            if run["cache"] or job.cache_hits:
+                print(f"Job {job.id}: {job.cache_hits}/{job.done} answers from the response cache ({job.cache_hit_rate:.1%})")
+            if job.prompt_tokens or job.completion_tokens:
+                print(f"Job {job.id}: {job.prompt_tokens} prompt and {job.completion_tokens} completion tokens, cost {job.cost:.4f}")
+        if not outputs:
+            raise RuntimeError("Could not retrieve a response.")
+
+    return runner
+
 @app.post("/startup")
 async def send_prompt(
     base_description: str = Body(..., description="Base description text"),
@@ -161,8 +431,14 @@ async def send_prompt(
     case2_description: str = Body(..., description="Case 2 description"),
     ending: str = Body(..., description="Optional ending text"),
     batch_size: int = Query(default=1, ge=1, le=100000),
-    model: str = Query(..., regex="^(yandexGPT|gigaChat|chatGPT|lmStudio)$"),
-    lang: str = Query(default="en", regex="^(en|ru)$")
+    model: str = Query(..., regex=MODEL_PATTERN),
+    lang: str = Query(default="en", regex="^(en|ru)$"),
+    seed: Optional[int] = Query(default=None, ge=0, description="Run seed, scenarios of a run are reproducible from it"),
+    parallel: bool = Query(default=False, description="Generate prompts in the process pool"),
+    format: str = Query(default="csv", regex="^(csv|parquet|both)$", description="Result file format"),
+    cache: Optional[bool] = Query(default=None, description="Answer repeated prompts from the response cache, by default for deterministic models only"),
+    unique: bool = Query(default=False, description="Never send the same scenario twice in a run"),
+    async_mode: bool = Query(default=False, description="YandexGPT only: submit async operations and poll them together")
 ) -> dict:
     """
     Startup endpoint for sending prompts to AI models.
@@ -175,147 +451,393 @@ async def send_prompt(
         batch_size: Number of prompts to generate (1-100000)
         model: AI model to use
         lang: Language code
+        seed: Run seed, a fresh one is drawn if not given
+        parallel: Generate prompts across processes, for large batches
+        format: Result file format: csv, parquet or both
+        cache: Reuse stored answers to identical requests instead of calling the model again, by default only for models asked for deterministic answers
+        unique: Draw every scenario at most once, repeats are redrawn
+        async_mode: Send YandexGPT requests through completionAsync, for large batches
         
     Returns:
-        dict: Response status
+        dict: Response status with the ID of the queued job and the run seed
     """
+    if unique and parallel:
+        raise HTTPException(status_code=400, detail="unique runs draw scenarios in sequence and cannot be combined with parallel")
+    if async_mode and not PROVIDERS[model].supports_async_mode:
+        raise HTTPException(status_code=400, detail=f"async_mode is not supported by {model}")
 
-    model_version = ''
-    responses_list = []
-    model_answer = ''
-    final_prompt = ''
-    scenario_info = {}
+    run = {
+        "base_description": base_description,
+        "case1_description": case1_description,
+        "case2_description": case2_description,
+        "ending": ending,
+        "batch_size": batch_size,
+        "model": model,
+        "lang": lang,
+        "seed": SeedStream(seed).seed,
+        "parallel": parallel,
+        "format": format,
+        "cache": cache,
+        "unique": unique,
+        "async_mode": async_mode,
+    }
+    job = JobQueue.submit(await create_runner(run), total=batch_size, params={name: run[name] for name in JOB_PARAMS if name in run})
 
-    if model == "yandexGPT":
-        catalog_id = os.environ.get("CATALOG_ID_YANDEXGPT")
-        api_key = get_yandex_token()
-        assert catalog_id and api_key, 'no keys specified...'
+    return {
+        "status": "accepted",
+        "job_id": job.id,
+        "model": model,
+        "batch_size": batch_size,
+        "lang": lang,
+        "seed": run["seed"],
+    }
+
+@app.post("/compare")
+async def compare_models(
+    base_description: str = Body(..., description="Base description text"),
+    case1_description: str = Body(..., description="Case 1 description"),
+    case2_description: str = Body(..., description="Case 2 description"),
+    ending: str = Body(..., description="Optional ending text"),
+    models: List[str] = Query(..., description="Models to send every scenario to"),
+    batch_size: int = Query(default=1, ge=1, le=100000),
+    lang: str = Query(default="en", regex="^(en|ru)$"),
+    seed: Optional[int] = Query(default=None, ge=0, description="Run seed, scenarios of a run are reproducible from it"),
+    parallel: bool = Query(default=False, description="Generate prompts in the process pool"),
+    cache: Optional[bool] = Query(default=None, description="Answer repeated prompts from the response cache, by default for deterministic models only"),
+    unique: bool = Query(default=False, description="Never send the same scenario twice in a run"),
+    async_mode: bool = Query(default=False, description="Submit YandexGPT requests as async operations")
+) -> dict:
+    """
+    Send one scenario set to several models in a single run.
 
-        client = YandexGPTClient(catalog_id, api_key)
+    Every scenario is generated once and dispatched to all models concurrently,
+    the answers are joined into one CSV file with one answer column per model.
 
-        system_content = base_description
+    Args:
+        base_description: Base description text
+        case1_description: Case 1 description
+        case2_description: Case 2 description
+        ending: Optional ending text
+        models: Models to compare, at least two
+        batch_size: Number of scenarios to generate (1-100000)
+        lang: Language code
+        seed: Run seed, a fresh one is drawn if not given
+        parallel: Generate prompts across processes, for large batches
+        cache: Reuse stored answers to identical requests instead of calling the models again, by default only for models asked for deterministic answers
+        unique: Draw every scenario at most once, repeats are redrawn
+        async_mode: Send YandexGPT requests through completionAsync
 
-        prompt = generate_prompt_text(
-            description="  ",
-            case1=case1_description,
-            case2=case2_description,
-            ending=ending,
-            lang=lang
-        )
-        user_content = prompt.prompt
-        response = client.generate_response(system_content, user_content, verbose=True)
-        if response:
-            print("\n--- Response ---")
-            response = response.json()
-            print(response)
-            print("------------------")
-        else:
-            print("\nCould not retrieve a response.")
-            raise HTTPException(status_code=500)
-        
-        model_version = f'{model}-{response["result"]["modelVersion"]}' 
-        model_answer = response['result']['alternatives'][0]['message']['text']
-        final_prompt = system_content + user_content
-        scenario_info = prompt.scenario_info
+    Returns:
+        dict: Response status with the ID of the queued job and the run seed
+    """
+    models = list(dict.fromkeys(models))
+    unknown = [model for model in models if not re.fullmatch(MODEL_PATTERN, model)]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown models: {', '.join(unknown)}")
+    if len(models) < 2:
+        raise HTTPException(status_code=400, detail="compare needs at least two different models")
+    if unique and parallel:
+        raise HTTPException(status_code=400, detail="unique runs draw scenarios in sequence and cannot be combined with parallel")
 
-        responses_list.append({'model_answer': model_answer,
-                               'prompt': final_prompt,
-                               'scenario_info': scenario_info})
+    run = {
+        "base_description": base_description,
+        "case1_description": case1_description,
+        "case2_description": case2_description,
+        "ending": ending,
+        "batch_size": batch_size,
+        "model": "compare",
+        "models": models,
+        "lang": lang,
+        "seed": SeedStream(seed).seed,
+        "parallel": parallel,
+        "format": "csv",
+        "cache": cache,
+        "unique": unique,
+        "async_mode": async_mode,
+    }
+    job = JobQueue.submit(await create_runner(run), total=batch_size, params={name: run[name] for name in JOB_PARAMS if name in run})
 
+    return {
+        "status": "accepted",
+        "job_id": job.id,
+        "models": models,
+        "batch_size": batch_size,
+        "lang": lang,
+        "seed": run["seed"],
+    }
 
-    elif model == "gigaChat":
-        api_key = os.environ.get("API_KEY_GIGACHAT")
-        assert api_key, 'no keys specified...'
+@app.post("/jobs/{job_id}/resume")
+async def resume_job(job_id: str) -> dict:
+    """
+    Resume an interrupted batch job from its checkpoint journal.
 
-        client = GigaChatClient(api_key)
+    Answers already received are written to the result files again, only the
+    missing and failed items are sent to the model.
 
-        prompt = generate_prompt_text(
-            description=base_description,
-            case1=case1_description,
-            case2=case2_description,
-            ending=ending,
-            lang=lang
-        )
-        user_content = prompt.prompt
-        response = client.generate_response(user_content)
-
-        if response:
-            print("\n--- Response ---")
-            response = response.json()
-            print(response)
-            print("------------------")
-        else:
-            print("\nCould not retrieve a response.")
-            raise HTTPException(status_code=500)
-        
-        model_version = f'{model}-{response["model"]}' 
-        model_answer = response['choices'][0]['message']['content']
-        final_prompt = user_content
-        scenario_info = prompt.scenario_info
-
-        responses_list.append({'model_answer': model_answer,
-                               'prompt': final_prompt,
-                               'scenario_info': scenario_info})
-        
-    elif model == "chatGPT":
-        pass
+    Args:
+        job_id: ID of the interrupted job
 
-    filename, data = convert_csv(model_version, responses_list, lang)
-     
-    is_ok = S3Client.save(data=data, object_name=filename)
-    if is_ok:
-        print("----Fine----")
-    else:
-        print("----bad----")
+    Returns:
+        dict: Response status with the ID of the resumed job
+    """
+    job = JobQueue.get(job_id)
+    if job is not None and job.status in ("queued", "running"):
+        raise HTTPException(status_code=409, detail=f"Job is still {job.status}: {job_id}")
+    journal = get_checkpoint_journal()
+    run = await journal.run(journal.request, job_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"No checkpoint for job: {job_id}")
+    if await journal.run(journal.status, job_id) == "done":
+        raise HTTPException(status_code=409, detail=f"Job already finished: {job_id}")
+
+    job = JobQueue.submit(await create_runner(run, resume=True), total=run["batch_size"], params={name: run[name] for name in JOB_PARAMS if name in run}, job_id=job_id)
 
-    
     return {
         "status": "accepted",
-        "model": model,
-        "batch_size": batch_size,
-        "lang": lang,
-        "response": response,
-        "prompt": prompt.prompt,
+        "job_id": job.id,
+        "model": run["model"],
+        "batch_size": run["batch_size"],
+        "lang": run["lang"],
+        "seed": run["seed"],
     }
 
+@app.get("/jobs")
+async def get_jobs() -> list:
+    """List all known batch jobs, newest first."""
+    return [job.to_dict() for job in JobQueue.list()]
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> dict:
+    """
+    Report progress of a batch job.
+
+    Args:
+        job_id: Job ID returned by /startup
+
+    Returns:
+        dict: Job status, done/failed/remaining counters, throughput, ETA and result file name
+    """
+    job = JobQueue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job.to_dict()
+
+# Seconds between keep-alive comments of an idle event stream, proxies drop silent connections
+SSE_KEEPALIVE = float(os.environ.get("SSE_KEEPALIVE", 15))
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str) -> StreamingResponse:
+    """
+    Stream the progress of a batch job as server-sent events.
+
+    A 'progress' event with the job counters opens the stream, then every
+    finished item sends a 'result' or 'failed' event and the end of the job a
+    'status' event, after which the stream is closed. Every event carries the
+    current counters under 'job'.
+
+    Args:
+        job_id: Job ID returned by /startup or /compare
+
+    Returns:
+        StreamingResponse: text/event-stream of the job's events
+    """
+    job = JobQueue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    # Subscribed before the first event is sent, so nothing published in between is lost
+    queue = JobQueue.subscribe(job_id)
+
+    async def events():
+        try:
+            yield sse_event("progress", job.progress())
+            while True:
+                current = JobQueue.get(job_id) or job
+                if current.status in ("done", "failed") and queue.empty():
+                    yield sse_event("status", {"type": "status", "error": current.error, "job": current.progress()})
+                    return
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_event(event["type"], event)
+                if event["type"] == "status":
+                    return
+        finally:
+            JobQueue.unsubscribe(job_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/stream")
+async def stream_prompt(
+    base_description: str = Body(..., description="Base description text"),
+    case1_description: str = Body(..., description="Case 1 description"),
+    case2_description: str = Body(..., description="Case 2 description"),
+    ending: str = Body(..., description="Optional ending text"),
+    model: str = Query(..., regex=MODEL_PATTERN),
+    lang: str = Query(default="en", regex="^(en|ru)$"),
+    seed: Optional[int] = Query(default=None, ge=0, description="Seed of the scenario")
+) -> StreamingResponse:
+    """
+    Generate one prompt and stream the model's answer as server-sent events.
+
+    The stream opens with a 'prompt' event, continues with a 'delta' event per
+    text fragment of the answer and ends with 'done' carrying the whole answer,
+    or 'error' if the model could not be reached.
+
+    Args:
+        base_description: Base description text
+        case1_description: Case 1 description
+        case2_description: Case 2 description
+        ending: Optional ending text
+        model: AI model to use
+        lang: Language code
+        seed: Seed of the scenario, a fresh one is drawn if not given
+
+    Returns:
+        StreamingResponse: text/event-stream of the prompt and the answer
+    """
+    provider = await acreate_provider(model, get_settings())
+    system_content, description = provider.split_description(base_description)
+    prompt = generate_prompt_text(lang=lang, description=description, case1=case1_description, case2=case2_description,
+                                  ending=ending, rng=SeedStream(seed).scenario_random(0))
+
+    async def events():
+        yield sse_event("prompt", prompt.dict())
+        parts = []
+        try:
+            async for text in provider.stream(system_content, prompt.prompt):
+                parts.append(text)
+                yield sse_event("delta", {"text": text})
+        except Exception as e:
+            print(f"Streaming from {model} failed: {e}")
+            yield sse_event("error", {"detail": str(e)})
+            return
+        yield sse_event("done", {"model": model, "answer": "".join(parts)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.get("/files")
-async def get_files(request: Request):
-     files = S3Client.get_objects()
+async def get_files(
+    request: Request,
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=50, ge=1, le=1000),
+    prefix: str = Query(default=""),
+    model: Optional[str] = Query(default=None),
+    lang: Optional[str] = Query(default=None, regex="^(en|ru)?$")
+):
+     # Empty filter fields of the files page mean "any"
+     model = model or None
+     lang = lang or None
+     listing = await S3Client.aget_objects_page(page=page, page_size=page_size, prefix=prefix, model=model, lang=lang)
      if request.headers.get("accept", "").startswith("text/html"):
         return templates.TemplateResponse(
             "files.html",
             {
                 "request": request,
-                "files": files,
+                "files": listing["files"],
+                "listing": listing,
+                "filters": {"prefix": prefix, "model": model or "", "lang": lang or ""},
                 "api_path": API_URL,
             }
         )
+     return listing
      
 @app.get('/download')
-async def get_file(filename: str):
+async def get_file(
+    filename: str,
+    format: Optional[str] = Query(default=None, regex="^(csv|parquet)$"),
+    byte_range: Optional[str] = Header(default=None, alias="Range"),
+    if_range: Optional[str] = Header(default=None),
+):
+    """
+    Download a result file, resumable through HTTP range requests.
+
+    Args:
+        filename: File to download
+        format: Optional format of the same run, replaces the file extension
+        byte_range: Optional single byte range, e.g. 'bytes=1048576-'
+        if_range: Optional ETag the range is only valid for, the whole file is sent if it changed
+
+    Returns:
+        StreamingResponse: The file or the requested part of it (206)
+    """
+    # Выбираем файл нужного формата того же запуска
+    if format is not None:
+        filename = f'{os.path.splitext(filename)[0]}.{format}'
+    media_type = MEDIA_TYPES.get(os.path.splitext(filename)[1], "application/octet-stream")
+
+    # Only single ranges are passed on, anything else gets the whole file
+    if byte_range is not None and not re.fullmatch(r"bytes=(\d+-\d*|-\d+)", byte_range.strip()):
+        byte_range = None
+
     try:
         # Скачиваем файл из S3
-        file = S3Client.download(filename)
-        body = file['content']['Body']
-        
-        # Устанавливаем заголовки для скачивания
-        headers = {
-            "Content-Disposition": f'attachment; filename="{filename}"',
-            "Content-Type": "text/csv"
-        }
-        
-        # Потоковая передача файла
-        return StreamingResponse(
-            content=body.iter_chunks(),
-            media_type="text/csv",
-            headers=headers
-        )
+        file = await S3Client.adownload(filename, byte_range, if_match=if_range if byte_range else None)
     except Exception as e:
-        raise HTTPException(status_code=404, detail=f"File not found: {str(e)}")
+        code = error_code(e)
+        if code == "InvalidRange":
+            raise HTTPException(status_code=416, detail=f"Range not satisfiable: {byte_range}")
+        if code in ("PreconditionFailed", "412"):
+            # The file changed since the interrupted download, start over
+            file = await S3Client.adownload(filename)
+        else:
+            raise HTTPException(status_code=404, detail=f"File not found: {str(e)}")
+    content = file['content']
+
+    # Устанавливаем заголовки для скачивания
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Content-Length": str(content["ContentLength"]),
+        "Accept-Ranges": "bytes",
+    }
+    if content.get("ETag"):
+        headers["ETag"] = content["ETag"]
+    status_code = 200
+    if content.get("ContentRange"):
+        headers["Content-Range"] = content["ContentRange"]
+        status_code = 206
+
+    # Потоковая передача файла, чтение из S3 идёт в пуле потоков S3Client
+    return StreamingResponse(
+        content=S3Client.aiter_chunks(content['Body']),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers
+    )
+
+@app.get('/download_zip')
+async def get_files_zip(filenames: list[str] = Query(..., description="files to download")):
+    """
+    Download several files as one streamed ZIP archive.
+
+    Args:
+        filenames: Files to put into the archive
+
+    Returns:
+        StreamingResponse: ZIP archive built while the files are fetched
+    """
+    # The archive is streamed after the 200 is sent, a missing file could only truncate it
+    missing = [name for name, found in zip(filenames, await S3Client.aexists(filenames)) if not found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Files not found: {', '.join(missing)}")
+    headers = {
+        "Content-Disposition": 'attachment; filename="results.zip"',
+    }
+    return StreamingResponse(
+        content=stream_zip(S3Client.stream_multiple(filenames)),
+        media_type="application/zip",
+        headers=headers
+    )
 
 @app.delete('/delete')
 async def delete_file(filenames: list[str] = Body(..., description="files to delete")):
     try:
-        S3Client.delete(filenames)
+        await S3Client.adelete(filenames)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
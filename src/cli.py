@@ -0,0 +1,68 @@
+"""Command line generation of prompt corpora.
+
+Example:
+    python cli.py --lang ru --count 1000000 --seed 42 --output corpus.jsonl
+    python cli.py --exhaustive --dimension gender --dimension age --output coverage.jsonl
+"""
+import argparse
+import json
+import sys
+import time
+
+from utils.generator import SCENARIO_DIMENSIONS
+from utils.parallel import generate_prompts_parallel, GENERATION_SHARD_SIZE
+from utils.rng import new_seed
+from utils.scenario_space import ScenarioSpace
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate scenario prompts across all cores")
+    parser.add_argument("--lang", default="en", choices=["en", "ru"], help="Language code")
+    parser.add_argument("--count", type=int, default=None, help="Number of prompts, the whole space with --exhaustive")
+    parser.add_argument("--seed", type=int, default=None, help="Run seed, a fresh one is drawn if not given")
+    parser.add_argument("--output", default="-", help="JSON lines output file, stdout by default")
+    parser.add_argument("--shard-size", type=int, default=GENERATION_SHARD_SIZE, help="Scenarios per shard")
+    parser.add_argument("--bulk", action="store_true", help="Use the vectorized scenario generator")
+    parser.add_argument("--exhaustive", action="store_true", help="Enumerate every distinct scenario instead of drawing them")
+    parser.add_argument("--dimension", action="append", choices=SCENARIO_DIMENSIONS, help="Scenario dimension, repeatable, all by default")
+    parser.add_argument("--description", default=None, help="Custom description")
+    parser.add_argument("--case1", default=None, help="Custom case 1")
+    parser.add_argument("--case2", default=None, help="Custom case 2")
+    parser.add_argument("--ending", default="", help="Ending text")
+    args = parser.parse_args()
+
+    count = args.count
+    if args.exhaustive:
+        size = len(ScenarioSpace(args.dimension))
+        print(f"Scenario space of {size} scenarios", file=sys.stderr)
+        count = size if count is None else min(count, size)
+    elif count is None:
+        parser.error("--count is required unless --exhaustive is given")
+
+    seed = new_seed() if args.seed is None else args.seed
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    started = time.time()
+    written = 0
+    try:
+        for shard in generate_prompts_parallel(
+            args.lang, count, seed,
+            shard_size=args.shard_size,
+            description=args.description,
+            case1=args.case1,
+            case2=args.case2,
+            ending=args.ending,
+            bulk=args.bulk,
+            dimensions=args.dimension,
+            exhaustive=args.exhaustive,
+        ):
+            for item in shard:
+                output.write(json.dumps(item, ensure_ascii=False) + "\n")
+            written += len(shard)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"Generated {written} prompts with seed {seed} in {time.time() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+
+from utils.bulk import generate_scenarios_range
+from utils.parallel import generate_shard
+from utils.rng import SeedStream, SCENARIO_BLOCK_SIZE
+
+
+class SeedStreamTest(unittest.TestCase):
+    def test_streams_depend_only_on_seed_and_index(self):
+        first, second = SeedStream(7), SeedStream(7)
+        self.assertEqual(first.scenario_random(3).random(), second.scenario_random(3).random())
+        self.assertNotEqual(first.scenario_random(3).random(), first.scenario_random(4).random())
+        self.assertNotEqual(first.scenario_random(3).random(), SeedStream(8).scenario_random(3).random())
+        self.assertTrue(np.array_equal(first.block_generator(1).integers(0, 100, 10), second.block_generator(1).integers(0, 100, 10)))
+
+
+class ScenarioRangeTest(unittest.TestCase):
+    def test_shards_match_the_whole_run(self):
+        count = 2 * SCENARIO_BLOCK_SIZE + 100
+        whole = generate_scenarios_range("en", 0, count, 11)
+        # Shards straddling block boundaries must not shift the scenarios
+        bounds = [0, 100, SCENARIO_BLOCK_SIZE - 1, SCENARIO_BLOCK_SIZE + 5, 2 * SCENARIO_BLOCK_SIZE + 1, count]
+        shards = [generate_scenarios_range("en", start, stop, 11) for start, stop in zip(bounds, bounds[1:])]
+        for name in ("dimensions", "counts_1", "counts_2"):
+            self.assertTrue(np.array_equal(
+                getattr(whole, name), np.concatenate([getattr(shard, name) for shard in shards])
+            ))
+
+    def test_seed_changes_the_run(self):
+        first = generate_scenarios_range("en", 0, 100, 1)
+        second = generate_scenarios_range("en", 0, 100, 2)
+        self.assertFalse(np.array_equal(first.counts_1, second.counts_1))
+
+
+class GenerateShardTest(unittest.TestCase):
+    def test_shards_match_the_whole_run(self):
+        for bulk in (False, True):
+            with self.subTest(bulk=bulk):
+                whole = generate_shard("en", 0, 30, 5, bulk=bulk)
+                shards = generate_shard("en", 0, 12, 5, bulk=bulk) + generate_shard("en", 12, 30, 5, bulk=bulk)
+                self.assertEqual(whole, shards)
+                self.assertEqual(whole, generate_shard("en", 0, 30, 5, bulk=bulk))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from utils.checkpoint import CheckpointJournal
+
+
+class CheckpointJournalTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.journal = CheckpointJournal(":memory:")
+
+    def tearDown(self):
+        self.journal.close()
+
+    async def test_resume_state(self):
+        journal = self.journal
+        journal.start("job", {"model": "gigaChat", "seed": 3})
+        await journal.run(journal.record, "job", 0, "k0", {"prompt": "p0"}, {"answer": "a0"})
+        await journal.run(journal.record, "job", 1, "k1", {"prompt": "p1"}, None)
+        await journal.run(journal.record, "job", 2, "k2", {"prompt": "p2"}, None, {"gigaChat": {"answer": "a2"}})
+        journal.set_uploads("job", [("x.csv", "u1")])
+        journal.finish("job", "failed")
+
+        done, failed = journal.items("job")
+        self.assertEqual(done, {0: {"answer": "a0"}})
+        self.assertEqual(failed, {1: {"prompt": "p1"}, 2: {"prompt": "p2"}})
+        self.assertEqual(journal.answers("job"), {2: {"gigaChat": {"answer": "a2"}}})
+        self.assertEqual(journal.uploads("job"), [("x.csv", "u1")])
+        self.assertEqual(journal.status("job"), "failed")
+
+        # Resuming keeps the request and the journaled items, a retried item replaces its entry
+        journal.start("job", {"model": "other"})
+        self.assertEqual(journal.request("job"), {"model": "gigaChat", "seed": 3})
+        self.assertEqual(journal.status("job"), "running")
+        journal.record("job", 1, "k1", {"prompt": "p1"}, {"answer": "a1"})
+        done, failed = journal.items("job")
+        self.assertEqual(sorted(done), [0, 1])
+        self.assertEqual(list(failed), [2])
+
+    def test_unknown_run(self):
+        self.assertIsNone(self.journal.request("nope"))
+        self.assertIsNone(self.journal.status("nope"))
+        self.assertEqual(self.journal.items("nope"), ({}, {}))
+        self.assertEqual(self.journal.uploads("nope"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import asyncio
+import json
+import unittest
+
+import httpx
+
+from api_clients import HTTPTransport, LMStudioClient
+
+BASE_URL = "http://stub/v1"
+
+
+class LMStudioClientTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.requests = []
+        HTTPTransport._clients[("lmStudio", None)] = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+        self.client = LMStudioClient(BASE_URL)
+
+    async def asyncTearDown(self):
+        await HTTPTransport.aclose()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        await asyncio.sleep(0.01)
+        if request.url.path == "/v1/models":
+            return httpx.Response(200, json={"data": [{"id": "stub-model"}]})
+        body = json.loads(request.content)
+        text = f"answer to {body['messages'][-1]['content']}"
+        if body["stream"]:
+            chunks = [json.dumps({"choices": [{"delta": {"content": word + " "}}]}) for word in text.split()]
+            return httpx.Response(200, text="".join(f"data: {chunk}\n\n" for chunk in chunks) + "data: [DONE]\n\n")
+        return httpx.Response(200, json={"model": body["model"], "choices": [{"message": {"role": "assistant", "content": text}}]})
+
+    def completion_bodies(self):
+        return [json.loads(request.content) for request in self.requests if request.url.path == "/v1/chat/completions"]
+
+    async def test_generate_response(self):
+        response = await self.client.generate_response("be brief", "hello")
+
+        self.assertEqual(response.json()["choices"][0]["message"]["content"], "answer to hello")
+        body, = self.completion_bodies()
+        self.assertEqual(body["model"], "stub-model")
+        self.assertEqual(body["temperature"], 0)
+        self.assertEqual([message["role"] for message in body["messages"]], ["system", "user"])
+
+    async def test_generate_batch_keeps_prompt_order(self):
+        responses = await self.client.generate_batch([(None, f"prompt {i}") for i in range(20)], concurrency=4)
+
+        self.assertEqual([response.json()["choices"][0]["message"]["content"] for response in responses],
+                         [f"answer to prompt {i}" for i in range(20)])
+        # The model is looked up once, however many requests start together
+        self.assertEqual(sum(request.url.path == "/v1/models" for request in self.requests), 1)
+
+    async def test_stream_response(self):
+        text = "".join([fragment async for fragment in self.client.stream_response(None, "stream me")])
+
+        self.assertEqual(text, "answer to stream me ")
+        body, = self.completion_bodies()
+        self.assertTrue(body["stream"])
+
+
+if __name__ == "__main__":
+    unittest.main()
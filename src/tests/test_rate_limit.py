@@ -0,0 +1,26 @@
+import time
+import unittest
+
+from api_clients.rate_limit import ProviderLimiter
+
+
+class ProviderLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_failed_probe_reopens_circuit(self):
+        limiter = ProviderLimiter("test", rate=1000, burst=1000)
+        breaker = limiter.breaker
+        # Half open: the reset timeout has passed, the next call is the probe
+        breaker.opened_until = time.monotonic() - 1
+
+        async def send():
+            raise RuntimeError("no models loaded")
+
+        with self.assertRaises(RuntimeError):
+            await limiter.call(send)
+
+        self.assertFalse(breaker.probing)
+        self.assertEqual(breaker.state, "open")
+        self.assertEqual(breaker.reset_timeout, 2 * breaker.base_reset_timeout)
+
+
+if __name__ == "__main__":
+    unittest.main()
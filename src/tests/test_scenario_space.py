@@ -0,0 +1,51 @@
+import unittest
+from itertools import combinations_with_replacement
+
+from utils.bulk import MAX_PAIRS, _index_tables
+from utils.scenario_space import ScenarioSpace, dimension_size, iter_dimension, _side
+from utils.scenario_index import ScenarioKey
+
+
+def brute_force(dimension):
+    """Every scenario some multiset of 1-5 table pairs produces."""
+    left, right = _index_tables().pairs[dimension]
+    pairs = list(zip(left.tolist(), right.tolist()))
+    keys = set()
+    for size in range(1, MAX_PAIRS + 1):
+        for picks in combinations_with_replacement(pairs, size):
+            keys.add(ScenarioKey(
+                dimension,
+                _side(tuple(sorted(pair[0] for pair in picks))),
+                _side(tuple(sorted(pair[1] for pair in picks))),
+            ))
+    return keys
+
+
+class ScenarioSpaceTest(unittest.TestCase):
+    def test_paired_dimensions_match_brute_force(self):
+        for dimension in ("gender", "age", "fitness", "social_value"):
+            with self.subTest(dimension=dimension):
+                expected = brute_force(dimension)
+                enumerated = list(iter_dimension(dimension))
+                self.assertEqual(dimension_size(dimension), len(expected))
+                self.assertEqual(len(enumerated), len(expected))
+                self.assertEqual(set(enumerated), expected)
+
+    def test_random_dimension_size(self):
+        num_chars = _index_tables().num_chars
+        sides = set()
+        for size in range(1, MAX_PAIRS + 1):
+            sides.update(_side(multiset) for multiset in combinations_with_replacement(range(num_chars), size))
+        dimension = next(d for d in ScenarioSpace().dimensions if d not in _index_tables().pairs)
+        self.assertEqual(dimension_size(dimension), len(sides) ** 2)
+
+    def test_ranges_match_the_whole_space(self):
+        space = ScenarioSpace(["age", "gender", "fitness"])
+        whole = list(space)
+        self.assertEqual(len(whole), len(space))
+        shards = [key for start, stop in space.shards(7) for key in space.iter_range(start, stop)]
+        self.assertEqual(shards, whole)
+
+
+if __name__ == "__main__":
+    unittest.main()
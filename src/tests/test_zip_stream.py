@@ -0,0 +1,27 @@
+import io
+import os
+import unittest
+import zipfile
+
+from utils.zip_stream import stream_zip
+
+
+class StreamZipTest(unittest.TestCase):
+    def test_round_trip(self):
+        files = {
+            "a.csv": [b"id,answer\n", b"1,yes\n" * 1000],
+            "b.parquet": [os.urandom(100_000), os.urandom(5)],
+            "empty.csv": [],
+        }
+        for compression in (zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED):
+            with self.subTest(compression=compression):
+                data = b"".join(stream_zip(((name, iter(chunks)) for name, chunks in files.items()), compression))
+                with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                    self.assertIsNone(archive.testzip())
+                    self.assertEqual(archive.namelist(), list(files))
+                    for name, chunks in files.items():
+                        self.assertEqual(archive.read(name), b"".join(chunks))
+
+
+if __name__ == "__main__":
+    unittest.main()
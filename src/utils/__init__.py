@@ -1,7 +1,36 @@
-from .generator import generate_scenarios_characters
-from .lang import get_localized_data
-from .prompt import construct_prompt
-from .i18n import setup_i18n
+from .generator import generate_scenarios_characters, format_character_counts, SCENARIO_DIMENSIONS, SCENARIO_DIMENSION_GROUP_TYPES
+from .lang import get_localized_data, LocalizedData, LocalizationRegistry, LocalizationTables
+from .prompt import construct_prompt, generate_prompt_data, build_prompt_data
+from .i18n import setup_i18n, get_translator, load_translation, clear_translators
 from .get_token import get_yandex_token
-from .convert_to_csv import convert_csv
-from .s3 import S3Client
\ No newline at end of file
+from .convert_to_csv import convert_csv, csv_row, joined_csv_row, csv_filename, CSVStreamWriter, JoinedCSVStreamWriter, CSV_FIELDNAMES
+from .settings import Settings, get_settings
+from .s3 import S3Client, MultipartUpload, error_code
+from .zip_stream import stream_zip
+from .batch import run_batch, BatchResult, DEFAULT_BATCH_CONCURRENCY
+from .jobs import Job, JobStore, InMemoryJobStore, JobManager, JobQueue
+from .checkpoint import CheckpointJournal, get_checkpoint_journal
+from .scenario_index import ScenarioKey, ScenarioIndex, UniqueScenarioSampler, scenario_key
+
+# Parquet export needs pyarrow and bulk generation numpy, they are imported once one of these names is first used
+_LAZY_EXPORTS = {
+    name: module
+    for module, names in (
+        ('.convert_to_parquet', ('convert_parquet', 'parquet_filename', 'ParquetStreamWriter', 'PARQUET_SCHEMA')),
+        ('.bulk', ('generate_scenarios_bulk', 'generate_scenarios_range', 'ScenarioBatch')),
+        ('.rng', ('SeedStream', 'new_seed', 'SCENARIO_BLOCK_SIZE')),
+        ('.scenario_space', ('ScenarioSpace', 'dimension_size', 'iter_dimension', 'scenario_characters')),
+        ('.parallel', ('generate_prompts_parallel', 'agenerate_prompts_parallel', 'generate_shard', 'get_generation_executor', 'shutdown_generation_executor')),
+    )
+    for name in names
+}
+
+
+def __getattr__(name):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
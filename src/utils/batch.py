@@ -0,0 +1,77 @@
+import asyncio
+import inspect
+import os
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Union
+
+DEFAULT_BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 16))
+
+
+@dataclass
+class BatchResult:
+    """Outcome of a batch run: collected answers in prompt order plus failure count."""
+    responses: List[dict] = field(default_factory=list)
+    failed: int = 0
+
+    @property
+    def completed(self) -> int:
+        return len(self.responses)
+
+
+async def run_batch(
+    generate: Callable[[int], Any],
+    send: Callable[[Any], Awaitable[Optional[dict]]],
+    batch_size: int,
+    concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    on_result: Optional[Callable[[int, Optional[dict]], Union[None, Awaitable[None]]]] = None,
+    collect: bool = True,
+    indices: Optional[Iterable[int]] = None,
+) -> BatchResult:
+    """
+    Generate `batch_size` items and send them to a model with bounded concurrency.
+
+    Items are generated lazily by the workers, so at most `concurrency`
+    prompts are alive at any time regardless of batch size.
+
+    Args:
+        generate: Builds the item for a given index (e.g. a PromptResponse), may be a coroutine function
+        send: Coroutine sending one item, returns a response row or None on failure
+        batch_size: Number of items to generate and send
+        concurrency: Maximum number of requests in flight
+        on_result: Optional callback or coroutine function invoked with (index, row) after every item
+        collect: Keep the rows in the result, disable when `on_result` already consumes them
+        indices: Subset of range(batch_size) to process, e.g. the items left by an interrupted run
+
+    Returns:
+        BatchResult: Successful rows in index order (if collected) and the number of failures
+    """
+    results: List[Optional[dict]] = [None] * batch_size if collect else []
+    indices = range(batch_size) if indices is None else list(indices)
+    pending = iter(indices)
+    failed = 0
+
+    async def worker():
+        nonlocal failed
+        for index in pending:
+            row = None
+            try:
+                item = generate(index)
+                if inspect.isawaitable(item):
+                    item = await item
+                row = await send(item)
+            except Exception as e:
+                print(f"Batch item {index} failed: {e}")
+            if row is None:
+                failed += 1
+            elif collect:
+                results[index] = row
+            if on_result is not None:
+                result = on_result(index, row)
+                if inspect.isawaitable(result):
+                    await result
+
+    workers = max(1, min(concurrency, len(indices)))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+
+    responses = [row for row in results if row is not None]
+    return BatchResult(responses=responses, failed=failed)
@@ -0,0 +1,286 @@
+"""Vectorized generation of many scenarios at once."""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .generator import SCENARIO_DIMENSIONS, SCENARIO_DIMENSION_GROUP_TYPES, format_character_counts
+from .lang import build_localized_data, get_localized_data
+from .prompt import construct_prompt
+from .rng import SeedStream, SCENARIO_BLOCK_SIZE
+from .scenario_index import ScenarioKey
+
+# Upper bound of pairs (or characters per side) in one scenario, as in generate_scenarios_characters
+MAX_PAIRS = 5
+
+DimensionMix = Union[None, str, Sequence[str], Mapping[str, float]]
+
+
+@dataclass(frozen=True)
+class _IndexTables:
+    """Character pair tables as index arrays into `all_chars`."""
+    num_chars: int
+    # Dimension name -> (left character indices, right character indices)
+    pairs: Dict[str, Tuple[np.ndarray, np.ndarray]]
+
+
+@lru_cache(maxsize=None)
+def _index_tables() -> _IndexTables:
+    # Table structure does not depend on the language, so it is built from the msgids
+    data = build_localized_data(lambda message: message)
+    index = {char: i for i, char in enumerate(data.all_chars)}
+
+    def to_arrays(pairs):
+        left = np.array([index[pair[0]] for pair in pairs], dtype=np.intp)
+        right = np.array([index[pair[1]] for pair in pairs], dtype=np.intp)
+        return left, right
+
+    return _IndexTables(
+        num_chars=len(data.all_chars),
+        pairs={
+            "species": to_arrays(data.species_pairs),
+            "social_value": to_arrays(data.social_value_pairs),
+            "gender": to_arrays(list(zip(data.females, data.males))),
+            "age": to_arrays(data.age_pairs),
+            "fitness": to_arrays(data.fitness_pairs),
+        },
+    )
+
+
+def _dimension_weights(dimensions: DimensionMix) -> np.ndarray:
+    """Turn a dimension mix into sampling probabilities over SCENARIO_DIMENSIONS."""
+    if dimensions is None:
+        dimensions = SCENARIO_DIMENSIONS
+    if isinstance(dimensions, str):
+        dimensions = [dimensions]
+    if not isinstance(dimensions, Mapping):
+        dimensions = {name: 1.0 for name in dimensions}
+
+    weights = np.zeros(len(SCENARIO_DIMENSIONS))
+    for name, weight in dimensions.items():
+        if name not in SCENARIO_DIMENSIONS:
+            raise ValueError(f"Unknown scenario dimension: {name}")
+        weights[SCENARIO_DIMENSIONS.index(name)] = weight
+    if weights.sum() <= 0:
+        raise ValueError("Dimension weights must sum to a positive value")
+    return weights / weights.sum()
+
+
+def _count_matrix(chars: np.ndarray, num: np.ndarray, num_chars: int) -> np.ndarray:
+    """Count the first `num[i]` characters of every row of `chars` into a (rows, num_chars) matrix."""
+    rows = len(chars)
+    mask = np.arange(chars.shape[1]) < num[:, None]
+    flat = (np.arange(rows)[:, None] * num_chars + chars)[mask]
+    return np.bincount(flat, minlength=rows * num_chars).reshape(rows, num_chars)
+
+
+@dataclass
+class ScenarioBatch:
+    """
+    Columnar batch of scenarios.
+
+    Row i is described by its dimension code (index into SCENARIO_DIMENSIONS) and
+    two rows of character counts, columns follow `all_chars` of the language.
+    """
+    lang: str
+    dimensions: np.ndarray
+    counts_1: np.ndarray
+    counts_2: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.dimensions)
+
+    @property
+    def characters(self) -> Tuple[str, ...]:
+        """Localized character names of the count matrix columns."""
+        return get_localized_data(self.lang).all_chars
+
+    def dimension(self, i: int) -> str:
+        return SCENARIO_DIMENSIONS[self.dimensions[i]]
+
+    def count_dicts(self, i: int) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Character counts of both sides of scenario i as name -> count dicts."""
+        characters = self.characters
+        return tuple(
+            {characters[c]: int(counts[i, c]) for c in np.flatnonzero(counts[i])}
+            for counts in (self.counts_1, self.counts_2)
+        )
+
+    def scenario_info(self, i: int) -> dict:
+        """Scenario info of scenario i in the format of generate_scenarios_characters."""
+        dimension = self.dimension(i)
+        count_dict_1, count_dict_2 = self.count_dicts(i)
+        return {
+            "scenario_dimension": dimension,
+            "scenario_dimension_group_type": list(SCENARIO_DIMENSION_GROUP_TYPES[dimension]),
+            "count_dict_1": count_dict_1,
+            "count_dict_2": count_dict_2,
+        }
+
+    def character_sets(self, i: int) -> Tuple[str, str]:
+        """Formatted character sets of scenario i, characters are listed in table order."""
+        data = get_localized_data(self.lang)
+        count_dict_1, count_dict_2 = self.count_dicts(i)
+        return format_character_counts(count_dict_1, data), format_character_counts(count_dict_2, data)
+
+    def render_prompt(
+        self,
+        i: int,
+        description: Optional[str] = None,
+        case1: Optional[str] = None,
+        case2: Optional[str] = None,
+        ending: Optional[str] = "",
+    ) -> str:
+        """
+        Render the prompt of scenario i.
+
+        Args:
+            i: Scenario index
+            description: Optional custom description
+            case1: Optional custom case 1
+            case2: Optional custom case 2
+            ending: Optional ending text
+
+        Returns:
+            str: Complete formatted prompt
+        """
+        data = get_localized_data(self.lang)
+        pedestrians_set_1, pedestrians_set_2 = self.character_sets(i)
+        return construct_prompt(
+            description=description or data.base_description,
+            case1=case1 or data.case1_description,
+            case2=case2 or data.case2_description,
+            pedestrians_set_1=pedestrians_set_1,
+            pedestrians_set_2=pedestrians_set_2,
+            case1_header=data.case1_header,
+            case2_header=data.case2_header,
+            ending=ending,
+            lang=self.lang,
+        )
+
+    def slice(self, start: int, stop: int) -> "ScenarioBatch":
+        """Scenarios with indices in [start, stop) as a new batch sharing the arrays."""
+        return ScenarioBatch(
+            lang=self.lang,
+            dimensions=self.dimensions[start:stop],
+            counts_1=self.counts_1[start:stop],
+            counts_2=self.counts_2[start:stop],
+        )
+
+    @classmethod
+    def concat(cls, batches: Sequence["ScenarioBatch"]) -> "ScenarioBatch":
+        """Join batches of the same language in order."""
+        return cls(
+            lang=batches[0].lang,
+            dimensions=np.concatenate([batch.dimensions for batch in batches]),
+            counts_1=np.concatenate([batch.counts_1 for batch in batches]),
+            counts_2=np.concatenate([batch.counts_2 for batch in batches]),
+        )
+
+    def scenario_key(self, i: int) -> ScenarioKey:
+        """Canonical key of scenario i, equal to scenario_key of its scenario info."""
+        return ScenarioKey(
+            self.dimension(i),
+            *(tuple((int(c), int(counts[i, c])) for c in np.flatnonzero(counts[i])) for counts in (self.counts_1, self.counts_2)),
+        )
+
+    def unique(self) -> "ScenarioBatch":
+        """Batch without repeated scenarios, first occurrences are kept in order."""
+        rows = np.concatenate([self.dimensions[:, None], self.counts_1, self.counts_2], axis=1)
+        _, first = np.unique(rows, axis=0, return_index=True)
+        keep = np.sort(first)
+        return ScenarioBatch(
+            lang=self.lang,
+            dimensions=self.dimensions[keep],
+            counts_1=self.counts_1[keep],
+            counts_2=self.counts_2[keep],
+        )
+
+    def iter_prompts(self, **kwargs) -> Iterator[str]:
+        """Lazily render the prompts of all scenarios, see `render_prompt` for arguments."""
+        for i in range(len(self)):
+            yield self.render_prompt(i, **kwargs)
+
+
+def generate_scenarios_bulk(
+    lang: str,
+    n: int,
+    dimensions: DimensionMix = None,
+    rng: Optional[np.random.Generator] = None,
+) -> ScenarioBatch:
+    """
+    Sample `n` scenarios at once.
+
+    Sampling follows generate_scenarios_characters: paired dimensions draw 1-5
+    pairs from their pair table, other dimensions draw 1-5 random characters per side.
+
+    Args:
+        lang: Language code ('en' or 'ru')
+        n: Number of scenarios
+        dimensions: Dimension name, list of names (uniform) or name -> weight mapping,
+            all dimensions uniformly by default
+        rng: NumPy random generator
+
+    Returns:
+        ScenarioBatch: Dimension codes and per-character count matrices
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    tables = _index_tables()
+    codes = rng.choice(len(SCENARIO_DIMENSIONS), size=n, p=_dimension_weights(dimensions)).astype(np.uint8)
+
+    counts_1 = np.zeros((n, tables.num_chars), dtype=np.uint8)
+    counts_2 = np.zeros((n, tables.num_chars), dtype=np.uint8)
+
+    for code in np.unique(codes):
+        rows = np.flatnonzero(codes == code)
+        size = len(rows)
+        pairs = tables.pairs.get(SCENARIO_DIMENSIONS[code])
+        if pairs is not None:
+            left, right = pairs
+            num = rng.integers(1, MAX_PAIRS + 1, size=size)
+            picks = rng.integers(0, len(left), size=(size, MAX_PAIRS))
+            counts_1[rows] = _count_matrix(left[picks], num, tables.num_chars)
+            counts_2[rows] = _count_matrix(right[picks], num, tables.num_chars)
+        else:
+            # Random characters with an independent count on each side
+            for counts in (counts_1, counts_2):
+                num = rng.integers(1, MAX_PAIRS + 1, size=size)
+                picks = rng.integers(0, tables.num_chars, size=(size, MAX_PAIRS))
+                counts[rows] = _count_matrix(picks, num, tables.num_chars)
+
+    return ScenarioBatch(lang=lang, dimensions=codes, counts_1=counts_1, counts_2=counts_2)
+
+
+def generate_scenarios_range(
+    lang: str,
+    start: int,
+    stop: int,
+    seed: Union[int, SeedStream],
+    dimensions: DimensionMix = None,
+) -> ScenarioBatch:
+    """
+    Generate scenarios [start, stop) of a seeded run.
+
+    The run is split into blocks of SCENARIO_BLOCK_SIZE scenarios, each drawn
+    from its own stream, so scenario i is identical however the run is sharded.
+
+    Args:
+        lang: Language code ('en' or 'ru')
+        start: Index of the first scenario
+        stop: Index after the last scenario
+        seed: Run seed or seed stream
+        dimensions: Dimension mix, see generate_scenarios_bulk
+
+    Returns:
+        ScenarioBatch: The requested scenarios in index order
+    """
+    seeds = seed if isinstance(seed, SeedStream) else SeedStream(seed)
+    first_block = start // SCENARIO_BLOCK_SIZE
+    last_block = (stop - 1) // SCENARIO_BLOCK_SIZE
+    batches = [
+        generate_scenarios_bulk(lang, SCENARIO_BLOCK_SIZE, dimensions, rng=seeds.block_generator(block))
+        for block in range(first_block, last_block + 1)
+    ]
+    offset = first_block * SCENARIO_BLOCK_SIZE
+    return ScenarioBatch.concat(batches).slice(start - offset, stop - offset)
@@ -0,0 +1,179 @@
+"""Durable per-item journal of batch runs, so interrupted runs can be resumed."""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH", "./cache/checkpoints.sqlite3")
+
+# Item states, failed items are sent again on resume
+ITEM_DONE = "done"
+ITEM_FAILED = "failed"
+
+
+class CheckpointJournal:
+    """
+    SQLite journal of batch runs.
+
+    Every run keeps the request it was started with, and every finished item
+    its prompt, scenario key, status and answer row. A resumed run replays the
+    answered items into the output files and sends only the rest.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        """
+        Initialize checkpoint journal.
+
+        Args:
+            path: SQLite database file, ':memory:' for a process-local journal
+        """
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " job_id TEXT PRIMARY KEY, request TEXT, status TEXT,"
+                " uploads TEXT, created_at REAL, updated_at REAL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                " job_id TEXT, item INTEGER, status TEXT, scenario_key TEXT, prompt TEXT, row TEXT,"
+                " PRIMARY KEY (job_id, item))"
+            )
+            self._connection = connection
+        return self._connection
+
+    def start(self, job_id: str, request: dict) -> None:
+        """Register a run with the request needed to rebuild it, keeps the journal of a resumed run."""
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO runs VALUES (?, ?, 'running', '[]', ?, ?)",
+                (job_id, json.dumps(request, ensure_ascii=False), now, now),
+            )
+            self.connection.execute("UPDATE runs SET status = 'running', updated_at = ? WHERE job_id = ?", (now, job_id))
+
+    def request(self, job_id: str) -> Optional[dict]:
+        """Request a run was started with, None for unknown runs."""
+        with self._lock:
+            row = self.connection.execute("SELECT request FROM runs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def status(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            row = self.connection.execute("SELECT status FROM runs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def finish(self, job_id: str, status: str) -> None:
+        with self._lock:
+            self.connection.execute("UPDATE runs SET status = ?, updated_at = ? WHERE job_id = ?", (status, time.time(), job_id))
+
+    def set_uploads(self, job_id: str, uploads: List[Tuple[str, str]]) -> None:
+        """Remember the (file name, upload ID) of the run's multipart uploads, so a resumed run can abort unfinished ones."""
+        with self._lock:
+            self.connection.execute("UPDATE runs SET uploads = ? WHERE job_id = ?", (json.dumps(uploads), job_id))
+
+    def uploads(self, job_id: str) -> List[Tuple[str, str]]:
+        with self._lock:
+            row = self.connection.execute("SELECT uploads FROM runs WHERE job_id = ?", (job_id,)).fetchone()
+        return [tuple(upload) for upload in json.loads(row[0])] if row else []
+
+    def record(self, job_id: str, item: int, scenario_key: str, prompt: dict, row: Optional[dict], answers: Optional[Dict[str, dict]] = None) -> None:
+        """
+        Store the outcome of one item.
+
+        Args:
+            job_id: Run the item belongs to
+            item: Index of the item in the run
+            scenario_key: Canonical key of the item's scenario
+            prompt: Prompt the item was sent with
+            row: Answer row, None if the item failed
+            answers: Answer rows by model of a failed compare item, for the models that did answer
+        """
+        status = ITEM_FAILED if row is None else ITEM_DONE
+        # Failed items keep the partial answers in place of the row
+        stored = row if row is not None else answers or None
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, item, status, scenario_key, json.dumps(prompt, ensure_ascii=False),
+                 None if stored is None else json.dumps(stored, ensure_ascii=False)),
+            )
+
+    def items(self, job_id: str) -> Tuple[Dict[int, dict], Dict[int, dict]]:
+        """
+        Journaled items of a run.
+
+        Args:
+            job_id: Run ID
+
+        Returns:
+            Tuple[Dict[int, dict], Dict[int, dict]]: Answer rows of the done items and prompts of the failed ones, by item index
+        """
+        done: Dict[int, dict] = {}
+        failed: Dict[int, dict] = {}
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT item, status, prompt, row FROM items WHERE job_id = ? ORDER BY item", (job_id,)
+            ).fetchall()
+        for item, status, prompt, row in rows:
+            if status == ITEM_DONE:
+                done[item] = json.loads(row)
+            else:
+                failed[item] = json.loads(prompt)
+        return done, failed
+
+    def answers(self, job_id: str) -> Dict[int, Dict[str, dict]]:
+        """Answer rows by model of the failed compare items of a run, for the models that did answer, by item index."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT item, row FROM items WHERE job_id = ? AND status = ? AND row IS NOT NULL", (job_id, ITEM_FAILED)
+            ).fetchall()
+        return {item: json.loads(row) for item, row in rows}
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Writes are serialized by the lock anyway, one thread keeps them off the event loop in order
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+        return self._executor
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run a blocking journal call, e.g. `record`, on the journal thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+_checkpoint_journal: Optional[CheckpointJournal] = None
+
+
+def get_checkpoint_journal() -> CheckpointJournal:
+    """Shared checkpoint journal at CHECKPOINT_PATH, opened on first use."""
+    global _checkpoint_journal
+    if _checkpoint_journal is None:
+        _checkpoint_journal = CheckpointJournal()
+    return _checkpoint_journal
@@ -1,31 +1,98 @@
 import csv
+import io
 import tempfile
+from typing import Optional
+
+CSV_FIELDNAMES = ['prompt', 'group_type_1', 'group_content_1', 'group_type_2', 'group_content_2', 'case']
+
+def csv_filename(model_version: str, lang: str, run_id: Optional[str] = None) -> str:
+    """File name of a result file, runs writing at the same time are told apart by their ID."""
+    if run_id:
+        return f'{model_version}_{lang}_{run_id}.csv'
+    return f'{model_version}_{lang}.csv'
+
+def csv_row(response: dict) -> dict:
+    """Turn a collected model response into a CSV row."""
+    return {
+        'prompt': response['prompt'],
+        'group_type_1': response['scenario_info']['scenario_dimension_group_type'][0],
+        'group_content_1': response['scenario_info']['count_dict_1'],
+        'group_type_2': response['scenario_info']['scenario_dimension_group_type'][1],
+        'group_content_2': response['scenario_info']['count_dict_2'],
+        'case': response['model_answer']
+    }
+
+def joined_csv_row(response: dict) -> dict:
+    """Turn a fan-out response into a CSV row with one answer column per model."""
+    row = csv_row(dict(response, model_answer=None))
+    del row['case']
+    row.update({f'case_{model}': answer for model, answer in response['answers'].items()})
+    return row
+
+class CSVStreamWriter:
+    """Encodes responses as CSV rows and writes them to a binary sink as they arrive."""
+
+    fieldnames = CSV_FIELDNAMES
+    # Rows are written through, there is never a buffer to flush
+    full = False
+
+    def __init__(self, sink, header: bool = True):
+        """
+        Initialize CSV stream writer.
+
+        Args:
+            sink: Object with a `write(bytes)` method, e.g. a MultipartUpload
+            header: Whether to write the header row first
+        """
+        self.sink = sink
+        self._text = io.StringIO()
+        self._writer = csv.DictWriter(self._text, fieldnames=self.fieldnames)
+        if header:
+            self._writer.writeheader()
+            self._flush()
+
+    def _flush(self) -> None:
+        self.sink.write(self._text.getvalue().encode('utf-8'))
+        self._text.seek(0)
+        self._text.truncate()
+
+    def write(self, response: dict) -> None:
+        self._writer.writerow(self.row(response))
+        self._flush()
+
+    def row(self, response: dict) -> dict:
+        return csv_row(response)
+
+    def close(self) -> None:
+        """Rows are written through immediately, nothing is left to flush."""
+
+class JoinedCSVStreamWriter(CSVStreamWriter):
+    """Writes fan-out responses: the scenario columns, then one answer column per model."""
+
+    def __init__(self, sink, models, header: bool = True):
+        """
+        Initialize joined CSV stream writer.
+
+        Args:
+            sink: Object with a `write(bytes)` method, e.g. a MultipartUpload
+            models: Models of the run, in column order
+            header: Whether to write the header row first
+        """
+        self.fieldnames = CSV_FIELDNAMES[:-1] + [f'case_{model}' for model in models]
+        super().__init__(sink, header)
+
+    def row(self, response: dict) -> dict:
+        return joined_csv_row(response)
 
 def convert_csv(model_version: str, responses, lang: str):
-    num = len(responses)
-    results = []
-    for response in responses:
-        results.append({
-            'prompt': response['prompt'],
-            'group_type_1': response['scenario_info']['scenario_dimension_group_type'][0],
-            'group_content_1': response['scenario_info']['count_dict_1'],
-            'group_type_2': response['scenario_info']['scenario_dimension_group_type'][1],
-            'group_content_2': response['scenario_info']['count_dict_2'],
-            'case': response['model_answer']
-            }
-        )
-    headers = list(results[0].keys())
-    filename = f'{model_version}_{lang}.csv'
+    filename = csv_filename(model_version, lang)
     data = bytes
-    with tempfile.TemporaryFile('r+', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=headers)
-        
-        writer.writeheader()
-        
-        for row in results:
-            writer.writerow(row)
+    with tempfile.TemporaryFile('w+b') as csvfile:
+        writer = CSVStreamWriter(csvfile)
+
+        for response in responses:
+            writer.write(response)
 
         csvfile.seek(0)
         data = csvfile.read()
-    data = bytes(data, encoding='utf-8')
     return filename, data
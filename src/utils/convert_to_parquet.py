@@ -0,0 +1,144 @@
+"""Columnar Parquet export of batch results."""
+import os
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .lang import build_localized_data, get_localized_data
+
+PARQUET_ROW_GROUP_SIZE = int(os.environ.get("PARQUET_ROW_GROUP_SIZE", 65536))
+PARQUET_COMPRESSION = os.environ.get("PARQUET_COMPRESSION", "zstd")
+
+# Count columns are named after the English character names, e.g. count_1_pregnant_woman
+CHARACTER_COLUMNS = tuple(
+    re.sub(r"\W+", "_", char) for char in build_localized_data(lambda message: message).all_chars
+)
+
+_category = pa.dictionary(pa.int8(), pa.string())
+
+PARQUET_SCHEMA = pa.schema(
+    [
+        ("prompt", pa.string()),
+        ("dimension", _category),
+        ("group_type_1", _category),
+        ("group_type_2", _category),
+        ("case", pa.string()),
+    ]
+    + [(f"count_1_{name}", pa.uint8()) for name in CHARACTER_COLUMNS]
+    + [(f"count_2_{name}", pa.uint8()) for name in CHARACTER_COLUMNS]
+)
+
+
+def parquet_filename(model_version: str, lang: str, run_id: Optional[str] = None) -> str:
+    """File name of a result file, runs writing at the same time are told apart by their ID."""
+    if run_id:
+        return f'{model_version}_{lang}_{run_id}.parquet'
+    return f'{model_version}_{lang}.parquet'
+
+
+class _SinkFile:
+    """Minimal writable file over a `write(bytes)` sink, as needed by the Parquet writer."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.sink.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class ParquetStreamWriter:
+    """
+    Buffers responses column-wise and writes them as compressed Parquet row groups.
+
+    Dimension and group types are dictionary encoded, character counts from
+    `scenario_info` become one uint8 column per character and side.
+    Once `full`, callers may `flush` the row group wherever the compression
+    should run, otherwise the next `write` does it.
+    """
+
+    def __init__(self, sink, lang: str, row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+        """
+        Initialize Parquet stream writer.
+
+        Args:
+            sink: Object with a `write(bytes)` method, e.g. a MultipartUpload
+            lang: Language of the counted character names in `scenario_info`
+            row_group_size: Rows buffered per row group
+        """
+        self.row_group_size = row_group_size
+        self._writer = pq.ParquetWriter(_SinkFile(sink), PARQUET_SCHEMA, compression=PARQUET_COMPRESSION)
+        self._columns = {}
+        self._char_index: Dict[str, int] = {}
+        for i, char in enumerate(get_localized_data(lang).all_chars):
+            self._char_index.setdefault(char, i)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._strings: Dict[str, List[str]] = {name: [] for name in ("prompt", "dimension", "group_type_1", "group_type_2", "case")}
+        self._counts = np.zeros((2, self.row_group_size, len(CHARACTER_COLUMNS)), dtype=np.uint8)
+        self._rows = 0
+
+    @property
+    def full(self) -> bool:
+        return self._rows >= self.row_group_size
+
+    def write(self, response: dict) -> None:
+        if self.full:
+            self.flush()
+        info = response['scenario_info']
+        self._strings["prompt"].append(response['prompt'])
+        self._strings["dimension"].append(info['scenario_dimension'])
+        self._strings["group_type_1"].append(info['scenario_dimension_group_type'][0])
+        self._strings["group_type_2"].append(info['scenario_dimension_group_type'][1])
+        self._strings["case"].append(response['model_answer'])
+        for side, count_dict in enumerate((info['count_dict_1'], info['count_dict_2'])):
+            for char, count in count_dict.items():
+                self._counts[side, self._rows, self._char_index[char]] = count
+        self._rows += 1
+
+    def flush(self) -> None:
+        """Compress the buffered rows into a row group and write it to the sink."""
+        if not self._rows:
+            return
+        arrays = [pa.array(self._strings["prompt"], pa.string())]
+        arrays += [
+            pa.array(self._strings[name], pa.string()).dictionary_encode().cast(_category)
+            for name in ("dimension", "group_type_1", "group_type_2")
+        ]
+        arrays.append(pa.array(self._strings["case"], pa.string()))
+        for side in range(2):
+            arrays += [pa.array(column) for column in self._counts[side, :self._rows].T]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=PARQUET_SCHEMA))
+        self._reset()
+
+    def close(self) -> None:
+        """Write the buffered rows and the file footer."""
+        self.flush()
+        self._writer.close()
+
+
+def convert_parquet(model_version: str, responses, lang: str):
+    """Parquet counterpart of convert_csv, returns the file name and the file content."""
+    sink = pa.BufferOutputStream()
+    writer = ParquetStreamWriter(sink, lang)
+    for response in responses:
+        writer.write(response)
+    writer.close()
+    return parquet_filename(model_version, lang), sink.getvalue().to_pybytes()
@@ -1,101 +1,92 @@
 import random
-from itertools import product
 from collections import Counter
-from utils.lang import get_localized_data
-from typing import List, Tuple, Dict
+from utils.lang import get_localized_data, LocalizedData
+from typing import List, Tuple, Dict, Mapping, Optional
 
 SCENARIO_RANDOM_SEED = 1243456
 random.seed(SCENARIO_RANDOM_SEED)
 
-def generate_scenarios_characters(lang: str, scenario_dimension: str) -> Tuple[str, str]:
+SCENARIO_DIMENSIONS = ("species", "social_value", "gender", "age", "fitness", "utilitarianism", "random")
+
+SCENARIO_DIMENSION_GROUP_TYPES = {
+'species': ["people", "animals"],
+'social_value': ["lower", "higher"],
+'gender': ["female", "male"],
+'age': ["younger", "older"],
+'fitness': ["lower", "higher"],
+'utilitarianism': ["less", "more"],
+'random': ["random", "random"],
+}
+
+def format_character_counts(char_counts: Mapping[str, int], data: LocalizedData) -> str:
+    """
+    Format character counts as text, e.g. "2 dogs and 1 man".
+
+    Args:
+        char_counts: Localized character names mapped to their counts, in output order
+        data: Localized tables of the prompt language
+
+    Returns:
+        str: Formatted character set
+    """
+    formatted_parts = []
+
+    for char, count in char_counts.items():
+        char_text = data.plurals[char] if count > 1 else char
+        formatted_parts.append(f"{count} {char_text}")
+
+    if len(formatted_parts) == 1:
+        return formatted_parts[0]
+    elif len(formatted_parts) == 2:
+        return f"{formatted_parts[0]}{data.text_joins[0]}{formatted_parts[1]}"
+    else:
+        return f"{', '.join(formatted_parts[:-1])}{data.text_joins[1]}{formatted_parts[-1]}"
+
+def generate_scenarios_characters(lang: str, scenario_dimension: str, rng: Optional[random.Random] = None) -> Tuple[str, str]:
     """
     Generate two sets of characters for the scenarios.
     
     Args:
         lang: Language code ('en' or 'ru')
         scenario_dimension: Type of scenario to generate
+        rng: Random generator of the scenario, the global one by default
         
     Returns:
         Tuple[str, str]: Two generated character sets as formatted strings
     """
-    # Unpack localized data into meaningful groups
-    (
-        # Species groups
-        animals,        # List of animal types
-        people,         # List of human types
-        
-        # Social groups
-        low_status,     # Lower social status characters
-        neutral_status, # Neutral social status characters
-        high_status,    # Higher social status characters
-        
-        # Gender groups
-        females,        # Female characters
-        males,          # Male characters
-        
-        # Paired groups
-        age_pairs,      # Age-based character pairs
-        fitness_pairs,  # Fitness-based character pairs
-        
-        # Character lists
-        all_chars,      # All possible characters
-        plural_forms,   # Plural forms of characters
-        
-        # Text formatting
-        text_joins,     # Conjunctions for joining text
-        
-        # Unused descriptions and headers
-        _,              # Base description
-        _,              # Case 1 description
-        _,              # Case 2 description
-        _,              # Case 1 header
-        _               # Case 2 header
-    ) = get_localized_data(lang)
+    # Localized tables are built once per language and cached
+    data = get_localized_data(lang)
+    rng = rng or random
 
-    scenario_dimension_group_types = {
-    'species': ["people", "animals"],
-    'social_value': ["lower", "higher"],
-    'gender': ["female", "male"],
-    'age': ["younger", "older"],
-    'fitness': ["lower", "higher"],
-    'utilitarianism': ["less", "more"],
-    'random': ["random", "random"],
-    }
-    
     # Generate character sets based on scenario type
     set_1, set_2 = [], []
     
     if scenario_dimension == "species":
-        num_pairs = random.choice(list(range(1, 6)))
-        char_pairs = random.choices(list(product(people, animals)), k=num_pairs)
+        num_pairs = rng.choice(list(range(1, 6)))
+        char_pairs = rng.choices(data.species_pairs, k=num_pairs)
         set_1 = [pair[0] for pair in char_pairs]
         set_2 = [pair[1] for pair in char_pairs]
     elif scenario_dimension == "social_value":
-        num_pairs = random.choice(list(range(1, 6)))
-        possible_pairs = (
-            list(product(low_status, neutral_status)) +
-            list(product(low_status, high_status)) +
-            list(product(neutral_status, high_status))
-        )
-        char_pairs = random.choices(possible_pairs, k=num_pairs)
+        num_pairs = rng.choice(list(range(1, 6)))
+        char_pairs = rng.choices(data.social_value_pairs, k=num_pairs)
         set_1 = [pair[0] for pair in char_pairs]
         set_2 = [pair[1] for pair in char_pairs]
     elif scenario_dimension == "gender":
-        num_pairs = random.choice(list(range(1, 6)))
-        indices = random.choices(range(len(females)), k=num_pairs)
-        set_1 = [females[i] for i in indices]
-        set_2 = [males[i] for i in indices]
+        num_pairs = rng.choice(list(range(1, 6)))
+        indices = rng.choices(range(len(data.females)), k=num_pairs)
+        set_1 = [data.females[i] for i in indices]
+        set_2 = [data.males[i] for i in indices]
     elif scenario_dimension == "age" or scenario_dimension == "fitness":
-        num_pairs = random.choice(list(range(1, 6)))
-        pairs = age_pairs if scenario_dimension == "age" else fitness_pairs
-        char_pairs = random.choices(pairs, k=num_pairs)
+        num_pairs = rng.choice(list(range(1, 6)))
+        pairs = data.age_pairs if scenario_dimension == "age" else data.fitness_pairs
+        char_pairs = rng.choices(pairs, k=num_pairs)
         set_1 = [pair[0] for pair in char_pairs]
         set_2 = [pair[1] for pair in char_pairs]
     else:  # random or other dimensions
-        set_1 = random.choices(all_chars, k=random.choice(list(range(1, 6))))
-        set_2 = random.choices(all_chars, k=random.choice(list(range(1, 6))))
+        set_1 = rng.choices(data.all_chars, k=rng.choice(list(range(1, 6))))
+        set_2 = rng.choices(data.all_chars, k=rng.choice(list(range(1, 6))))
 
-    scenario_dimension_group_type = list(scenario_dimension_group_types[scenario_dimension])
+    scenario_dimension_group_type = list(SCENARIO_DIMENSION_GROUP_TYPES[scenario_dimension])
 
     # Format the character sets into strings
     def format_character_set(characters: List[str]) -> str:
@@ -103,18 +94,7 @@ def generate_scenarios_characters(lang: str, scenario_dimension: str) -> Tuple[s
             return "", None
             
         char_counts = Counter(characters)
-        formatted_parts = []
-        
-        for char, count in char_counts.items():
-            char_text = plural_forms[all_chars.index(char)] if count > 1 else char
-            formatted_parts.append(f"{count} {char_text}")
-        
-        if len(formatted_parts) == 1:
-            return formatted_parts[0], char_counts
-        elif len(formatted_parts) == 2:
-            return f"{formatted_parts[0]}{text_joins[0]}{formatted_parts[1]}", char_counts
-        else:
-            return f"{', '.join(formatted_parts[:-1])}{text_joins[1]}{formatted_parts[-1]}", char_counts
+        return format_character_counts(char_counts, data), char_counts
         
     prompt_set_1, count_dict_1 = format_character_set(set_1)
     prompt_set_2, count_dict_2 = format_character_set(set_2)
@@ -1,25 +1,60 @@
 import os
 import gettext
+from functools import lru_cache
 from typing import Callable
 
+LOCALE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'locale')
+I18N_CACHE_SIZE = int(os.environ.get("I18N_CACHE_SIZE", 16))
+
+def load_translation(lang: str, localedir: str = LOCALE_DIR) -> gettext.NullTranslations:
+    """
+    Read the translation catalog of a language from disk without installing it.
+
+    Unlike `gettext.translation`, the file is always re-read, so a changed
+    catalog is picked up.
+
+    Args:
+        lang: Language code ('en' or 'ru')
+        localedir: Directory with the compiled catalogs
+
+    Returns:
+        gettext.NullTranslations: Catalog, or a pass-through one if no file exists
+    """
+    path = gettext.find('messages', localedir=localedir, languages=[lang])
+    if path is None:
+        # Fallback to default English if translation file not found
+        return gettext.NullTranslations()
+    with open(path, 'rb') as fp:
+        return gettext.GNUTranslations(fp)
+
+@lru_cache(maxsize=I18N_CACHE_SIZE)
+def get_translator(lang: str) -> gettext.NullTranslations:
+    """
+    Get the loaded catalog of a language.
+
+    Catalogs are kept in an LRU cache and never installed into builtins,
+    so several languages can be used from parallel threads and tasks.
+
+    Args:
+        lang: Language code ('en' or 'ru')
+
+    Returns:
+        gettext.NullTranslations: Catalog with `gettext`/`ngettext` methods
+    """
+    return load_translation(lang)
+
+def clear_translators() -> None:
+    """Forget every cached catalog, e.g. after the locale files changed."""
+    get_translator.cache_clear()
+
 def setup_i18n(lang: str) -> Callable:
     """
     Set up internationalization for the given language.
-    
+
     Args:
         lang: Language code ('en' or 'ru')
-        
+
     Returns:
         gettext.gettext: Translation function
     """
-    # Define the path to the locale directory
-    localedir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'locale')
-    
-    # Set up translations
-    try:
-        translation = gettext.translation('messages', localedir=localedir, languages=[lang])
-        translation.install()
-        return translation.gettext
-    except FileNotFoundError:
-        # Fallback to default English if translation file not found
-        return gettext.gettext 
\ No newline at end of file
+    return get_translator(lang).gettext
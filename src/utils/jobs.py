@@ -0,0 +1,247 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+import time
+import uuid
+from dataclasses import dataclass, field, asdict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+DEFAULT_JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+# Events buffered per subscriber, a subscriber that falls further behind misses events
+JOB_EVENT_BUFFER = int(os.environ.get("JOB_EVENT_BUFFER", 1000))
+# Finished jobs are kept in memory for JOB_TTL seconds, at most JOB_MAX_FINISHED of them
+JOB_TTL = float(os.environ.get("JOB_TTL", 24 * 3600))
+JOB_MAX_FINISHED = int(os.environ.get("JOB_MAX_FINISHED", 1000))
+
+
+@dataclass
+class Job:
+    """State and progress counters of a background batch run."""
+    total: int
+    params: dict = field(default_factory=dict)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"
+    done: int = 0
+    failed: int = 0
+    cache_hits: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    filename: Optional[str] = None
+    files: List[str] = field(default_factory=list)
+    response: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def remaining(self) -> int:
+        return self.total - self.done - self.failed
+
+    @property
+    def throughput(self) -> float:
+        """Finished items per second since the job started."""
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return (self.done + self.failed) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """Share of the answers served from the response cache."""
+        return self.cache_hits / self.done if self.done else 0.0
+
+    def add_usage(self, usage: Optional[dict], cost: float = 0.0) -> None:
+        """Count the tokens and cost of an answer."""
+        if usage:
+            self.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.completion_tokens += usage.get("completion_tokens", 0)
+        self.cost += cost
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until the job finishes, None while unknown."""
+        if self.status in ("done", "failed"):
+            return 0.0
+        throughput = self.throughput
+        if throughput <= 0:
+            return None
+        return self.remaining / throughput
+
+    def progress(self) -> dict:
+        """Counters of the job, small enough to send with every event."""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "remaining": self.remaining,
+            "throughput": round(self.throughput, 3),
+            "eta": self.eta,
+            "cache_hit_rate": round(self.cache_hit_rate, 3),
+            "cost": round(self.cost, 6),
+            "files": self.files,
+        }
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.update(remaining=self.remaining, throughput=round(self.throughput, 3), eta=self.eta, cache_hit_rate=round(self.cache_hit_rate, 3), cost=round(self.cost, 6))
+        return data
+
+
+class JobStore(ABC):
+    """Storage interface for jobs, implement it to keep jobs outside the process."""
+
+    @abstractmethod
+    def save(self, job: Job) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def list(self) -> List[Job]:
+        ...
+
+
+class InMemoryJobStore(JobStore):
+    """
+    Process-local job storage.
+
+    Queued and running jobs are always kept, finished ones expire after `ttl`
+    seconds and the oldest are dropped beyond `max_finished`.
+    """
+
+    def __init__(self, ttl: float = JOB_TTL, max_finished: int = JOB_MAX_FINISHED):
+        """
+        Initialize in-memory job store.
+
+        Args:
+            ttl: Seconds a finished job is kept
+            max_finished: Number of finished jobs kept
+        """
+        self.ttl = ttl
+        self.max_finished = max_finished
+        self._jobs: Dict[str, Job] = {}
+
+    def save(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        if job.finished_at is not None:
+            self._evict()
+
+    def _evict(self) -> None:
+        finished = sorted((job for job in self._jobs.values() if job.finished_at is not None), key=lambda job: job.finished_at)
+        expired_before = time.time() - self.ttl
+        excess = len(finished) - self.max_finished
+        for i, job in enumerate(finished):
+            if i < excess or job.finished_at < expired_before:
+                del self._jobs[job.id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+
+class JobManager:
+    """Queue of batch jobs executed by a fixed pool of asyncio workers."""
+
+    def __init__(self, store: Optional[JobStore] = None, workers: int = DEFAULT_JOB_WORKERS):
+        self.store = store or InMemoryJobStore()
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    def _ensure_workers(self) -> None:
+        # Workers are started lazily so they bind to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self) -> None:
+        while True:
+            job, runner = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            self.store.save(job)
+            try:
+                await runner(job)
+                job.status = "done"
+            except Exception as e:
+                print(f"Job {job.id} failed: {e}")
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                self.store.save(job)
+                self.publish(job, {"type": "status", "error": job.error})
+                self._queue.task_done()
+
+    def submit(self, runner: Callable[[Job], Awaitable[None]], total: int, params: Optional[dict] = None, job_id: Optional[str] = None) -> Job:
+        """
+        Enqueue a batch run.
+
+        Args:
+            runner: Coroutine function executing the batch and updating the job counters
+            total: Number of items in the batch
+            params: Request parameters to keep with the job
+            job_id: ID to run under, e.g. of the interrupted job being resumed
+
+        Returns:
+            Job: The queued job
+        """
+        self._ensure_workers()
+        job = Job(total=total, params=params or {})
+        if job_id is not None:
+            job.id = job_id
+        self.store.save(job)
+        self._queue.put_nowait((job, runner))
+        return job
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Queue receiving the events published for a job from now on."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=JOB_EVENT_BUFFER)
+        self._subscribers.setdefault(job_id, []).append(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(job_id, [])
+        if queue in queues:
+            queues.remove(queue)
+        if not queues:
+            self._subscribers.pop(job_id, None)
+
+    def publish(self, job: Job, event: dict) -> None:
+        """
+        Send an event to the subscribers of a job.
+
+        Args:
+            job: Job the event is about, its progress counters are attached
+            event: Event payload with a 'type' key
+        """
+        queues = self._subscribers.get(job.id)
+        if not queues:
+            return
+        event = dict(event, job=job.progress())
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Every event carries the counters, so a slow subscriber only misses rows, never the final status
+                if event["type"] == "status":
+                    queue.get_nowait()
+                    queue.put_nowait(event)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    def list(self) -> List[Job]:
+        return self.store.list()
+
+
+JobQueue = JobManager()
@@ -0,0 +1,163 @@
+"""Process-pool generation of scenarios and prompts."""
+import asyncio
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Iterator, List, Mapping, Optional
+
+from .bulk import DimensionMix, generate_scenarios_range
+from .prompt import build_prompt_data, generate_prompt_data
+from .rng import SeedStream, SCENARIO_BLOCK_SIZE
+from .scenario_space import ScenarioSpace, scenario_characters
+
+# Scenarios per shard, a multiple of the bulk block size so bulk shards never split a block
+GENERATION_SHARD_SIZE = int(os.environ.get("GENERATION_SHARD_SIZE", 2 * SCENARIO_BLOCK_SIZE))
+GENERATION_PROCESSES = int(os.environ.get("GENERATION_PROCESSES", os.cpu_count() or 1))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_generation_executor() -> ProcessPoolExecutor:
+    """Shared process pool used for generation, created on first use."""
+    global _executor
+    if _executor is None:
+        # Forking the threaded server process could copy locks held by other threads, workers are spawned instead
+        _executor = ProcessPoolExecutor(max_workers=GENERATION_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown_generation_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+def generate_shard(
+    lang: str,
+    start: int,
+    stop: int,
+    seed: int,
+    description: Optional[str] = None,
+    case1: Optional[str] = None,
+    case2: Optional[str] = None,
+    ending: Optional[str] = "",
+    bulk: bool = False,
+    dimensions: DimensionMix = None,
+    exhaustive: bool = False,
+) -> List[dict]:
+    """
+    Render prompts [start, stop) of a seeded run.
+
+    Args:
+        lang: Language code
+        start: Index of the first scenario
+        stop: Index after the last scenario
+        seed: Run seed
+        description: Optional custom description
+        case1: Optional custom case 1
+        case2: Optional custom case 2
+        ending: Optional ending text
+        bulk: Sample the scenarios with the vectorized generator instead of one by one
+        dimensions: Dimension mix of the vectorized generator, or the dimensions to enumerate
+        exhaustive: Take scenarios [start, stop) of the enumerated scenario space instead of random draws
+
+    Returns:
+        List[dict]: Prompt, character sets and scenario info of every scenario
+    """
+    if exhaustive:
+        space = ScenarioSpace(list(dimensions) if isinstance(dimensions, Mapping) else dimensions)
+        return [
+            build_prompt_data(lang, scenario_characters(key, lang), description, case1, case2, ending)
+            for key in space.iter_range(start, stop)
+        ]
+
+    seeds = SeedStream(seed)
+    if not bulk:
+        return [
+            generate_prompt_data(lang, description, case1, case2, ending, rng=seeds.scenario_random(index))
+            for index in range(start, stop)
+        ]
+
+    batch = generate_scenarios_range(lang, start, stop, seeds, dimensions)
+    shard = []
+    for i in range(len(batch)):
+        case1_set, case2_set = batch.character_sets(i)
+        shard.append({
+            "prompt": batch.render_prompt(i, description, case1, case2, ending),
+            "characters": {"case1": case1_set, "case2": case2_set},
+            "scenario_info": batch.scenario_info(i),
+        })
+    return shard
+
+
+def _shards(count: int, shard_size: int) -> Iterator[tuple]:
+    for start in range(0, count, shard_size):
+        yield start, min(start + shard_size, count)
+
+
+def generate_prompts_parallel(
+    lang: str,
+    count: int,
+    seed: int,
+    executor: Optional[Executor] = None,
+    shard_size: int = GENERATION_SHARD_SIZE,
+    prefetch: Optional[int] = None,
+    **kwargs,
+) -> Iterator[List[dict]]:
+    """
+    Generate `count` prompts across processes and stream the shards back in order.
+
+    Output is identical to a single-process run with the same seed.
+
+    Args:
+        lang: Language code
+        count: Number of prompts
+        seed: Run seed
+        executor: Process pool, the shared generation pool by default
+        shard_size: Scenarios per shard
+        prefetch: Shards in flight, twice the number of processes by default
+        **kwargs: Prompt options passed to generate_shard
+
+    Yields:
+        List[dict]: Consecutive shards of generated prompts
+    """
+    executor = executor or get_generation_executor()
+    prefetch = prefetch or 2 * GENERATION_PROCESSES
+    pending = deque()
+    for start, stop in _shards(count, shard_size):
+        pending.append(executor.submit(generate_shard, lang, start, stop, seed, **kwargs))
+        if len(pending) >= prefetch:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+async def agenerate_prompts_parallel(
+    lang: str,
+    count: int,
+    seed: int,
+    executor: Optional[Executor] = None,
+    shard_size: int = GENERATION_SHARD_SIZE,
+    prefetch: Optional[int] = None,
+    **kwargs,
+) -> AsyncIterator[List[dict]]:
+    """Async version of generate_prompts_parallel, the event loop is never blocked by generation."""
+    loop = asyncio.get_running_loop()
+    executor = executor or get_generation_executor()
+    prefetch = prefetch or 2 * GENERATION_PROCESSES
+    pending = deque()
+    try:
+        for start, stop in _shards(count, shard_size):
+            pending.append(loop.run_in_executor(
+                executor, partial(generate_shard, lang, start, stop, seed, **kwargs)
+            ))
+            if len(pending) >= prefetch:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
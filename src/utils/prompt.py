@@ -1,3 +1,9 @@
+import random
+from typing import Optional, Tuple
+
+from .generator import generate_scenarios_characters, SCENARIO_DIMENSIONS
+from .lang import get_localized_data
+
 def construct_prompt(
     case1: str,
     case2: str,
@@ -42,4 +48,87 @@ def construct_prompt(
     if ending:
         prompt += f"\n\n{ending}"
     
-    return prompt
\ No newline at end of file
+    return prompt
+
+def generate_prompt_data(
+    lang: str,
+    description: Optional[str] = None,
+    case1: Optional[str] = None,
+    case2: Optional[str] = None,
+    ending: Optional[str] = "",
+    rng: Optional[random.Random] = None
+) -> dict:
+    """
+    Generate a random scenario and its complete prompt.
+
+    Args:
+        lang: Language code
+        description: Optional custom description
+        case1: Optional custom case 1
+        case2: Optional custom case 2
+        ending: Optional ending text
+        rng: Random generator of the scenario, the global one by default
+
+    Returns:
+        dict: Prompt text, formatted character sets and scenario info
+    """
+    rng = rng or random
+    dimension = rng.choice(SCENARIO_DIMENSIONS)
+
+    # Generate pedestrian sets
+    scenario = generate_scenarios_characters(lang, dimension, rng=rng)
+
+    return build_prompt_data(lang, scenario, description, case1, case2, ending)
+
+def build_prompt_data(
+    lang: str,
+    scenario: Tuple[str, str, dict],
+    description: Optional[str] = None,
+    case1: Optional[str] = None,
+    case2: Optional[str] = None,
+    ending: Optional[str] = "",
+) -> dict:
+    """
+    Render the complete prompt of a given scenario.
+
+    Args:
+        lang: Language code
+        scenario: Formatted character sets and scenario info, as returned by generate_scenarios_characters
+        description: Optional custom description
+        case1: Optional custom case 1
+        case2: Optional custom case 2
+        ending: Optional ending text
+
+    Returns:
+        dict: Prompt text, formatted character sets and scenario info
+    """
+    pedestrians_set_1, pedestrians_set_2, scenario_info = scenario
+
+    # Get all language-specific strings
+    data = get_localized_data(lang)
+
+    # Use default descriptions if not provided
+    description = description or data.base_description
+    case1 = case1 or data.case1_description
+    case2 = case2 or data.case2_description
+
+    prompt = construct_prompt(
+        description=description,
+        case1=case1,
+        case2=case2,
+        pedestrians_set_1=pedestrians_set_1,
+        pedestrians_set_2=pedestrians_set_2,
+        case1_header=data.case1_header,
+        case2_header=data.case2_header,
+        ending=ending,
+        lang=lang
+    )
+
+    return {
+        "prompt": prompt,
+        "characters": {
+            "case1": pedestrians_set_1,
+            "case2": pedestrians_set_2
+        },
+        "scenario_info": scenario_info
+    }
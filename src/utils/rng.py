@@ -0,0 +1,60 @@
+"""Reproducible, splittable random streams for scenario generation."""
+import random
+import secrets
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Scenarios per bulk RNG block, shards aligned to blocks never share a stream
+SCENARIO_BLOCK_SIZE = 4096
+
+# Keep per-scenario and per-block streams apart in the key space
+_SCENARIO_STREAM = 0
+_BLOCK_STREAM = 1
+_RUN_STREAM = 2
+
+
+def new_seed() -> int:
+    """Draw a fresh run seed."""
+    return secrets.randbits(63)
+
+
+class SeedStream:
+    """
+    Random streams derived from a run seed.
+
+    Every stream is keyed by (seed, *spawn_key, index), so scenario i of run S
+    gets the same numbers whichever worker or process generates it.
+    """
+
+    def __init__(self, seed: Optional[int] = None, spawn_key: Tuple[int, ...] = ()):
+        """
+        Initialize seed stream.
+
+        Args:
+            seed: Run seed, a fresh one is drawn if not given
+            spawn_key: Path of the stream below the run seed
+        """
+        self.seed = new_seed() if seed is None else seed
+        self.spawn_key = tuple(spawn_key)
+
+    def spawn(self, *key: int) -> "SeedStream":
+        """Derive an independent child stream, e.g. per worker or per shard."""
+        return SeedStream(self.seed, self.spawn_key + key)
+
+    def _sequence(self, stream: int, index: int) -> np.random.SeedSequence:
+        return np.random.SeedSequence(self.seed, spawn_key=self.spawn_key + (stream, index))
+
+    def scenario_random(self, index: int) -> random.Random:
+        """`random.Random` for the scenario with the given index."""
+        state = self._sequence(_SCENARIO_STREAM, index).generate_state(4, dtype=np.uint32)
+        return random.Random(int.from_bytes(state.tobytes(), "little"))
+
+    def run_random(self) -> random.Random:
+        """`random.Random` for samplers that draw the scenarios of a run in sequence."""
+        state = self._sequence(_RUN_STREAM, 0).generate_state(4, dtype=np.uint32)
+        return random.Random(int.from_bytes(state.tobytes(), "little"))
+
+    def block_generator(self, block: int) -> np.random.Generator:
+        """NumPy generator for the bulk block with the given index."""
+        return np.random.default_rng(self._sequence(_BLOCK_STREAM, block))
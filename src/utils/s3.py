@@ -1,43 +1,281 @@
 from io import BytesIO
-import boto3
-from botocore.exceptions import NoCredentialsError, PartialCredentialsError
-from typing import Optional
+from typing import Optional, Tuple, List, Iterator, AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from cachetools import TTLCache
+import asyncio
+import math
 import os
-import datetime
+import queue
+import threading
 
-class _S3Client:
-    def __init__(self, endpoint: str, access_key: str, secret_key: str, bucket_name: str):
+from .settings import Settings, get_settings
+
+# S3 requires every part but the last to be at least 5 MiB
+S3_PART_SIZE = max(int(os.environ.get("S3_PART_SIZE", 8 * 1024 * 1024)), 5 * 1024 * 1024)
+
+# Objects fetched at the same time by multi-file downloads
+S3_DOWNLOAD_PARALLELISM = int(os.environ.get("S3_DOWNLOAD_PARALLELISM", 4))
+S3_CHUNK_SIZE = int(os.environ.get("S3_CHUNK_SIZE", 1024 * 1024))
+# Chunks buffered per object that is fetched ahead of the reader
+S3_PREFETCH_CHUNKS = int(os.environ.get("S3_PREFETCH_CHUNKS", 4))
+
+# Connections kept to S3, the async interface runs one blocking call per connection at most
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get("S3_MAX_POOL_CONNECTIONS", 32))
+S3_CONNECT_TIMEOUT = float(os.environ.get("S3_CONNECT_TIMEOUT", 5))
+S3_READ_TIMEOUT = float(os.environ.get("S3_READ_TIMEOUT", 60))
+
+# Seconds a bucket listing is reused by /files, save and delete drop it earlier
+S3_LIST_CACHE_TTL = float(os.environ.get("S3_LIST_CACHE_TTL", 30))
+
+
+class MultipartUpload:
+    """
+    Incremental upload of one object in fixed-size parts.
+
+    `write` only buffers, parts are handed out by `take_part` and sent with the
+    blocking `upload_part`, so callers decide where the network I/O runs.
+    Completed parts stay in the bucket until the upload is completed or aborted.
+    """
+
+    def __init__(self, s3_client, bucket_name: str, key: str, upload_id: str, part_size: int = S3_PART_SIZE, on_complete: Optional[Callable[[], None]] = None):
+        self.s3_client = s3_client
+        self.on_complete = on_complete
         self.bucket_name = bucket_name
-        self.s3_client = boto3.client(
+        self.key = key
+        self.upload_id = upload_id
+        self.part_size = part_size
+        self.parts: List[dict] = []
+        self._next_part = 1
+        self._buffer = BytesIO()
+
+    @property
+    def buffered(self) -> int:
+        return self._buffer.tell()
+
+    def write(self, data: bytes) -> None:
+        self._buffer.write(data)
+
+    def take_part(self, final: bool = False) -> Optional[Tuple[int, bytes]]:
+        """Detach the buffer as the next part once it reached the part size, or on the final call."""
+        if self.buffered < self.part_size and not (final and self.buffered):
+            return None
+        data = self._buffer.getvalue()
+        self._buffer = BytesIO()
+        part_number = self._next_part
+        self._next_part += 1
+        return part_number, data
+
+    def upload_part(self, part_number: int, data: bytes) -> None:
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id,
+            PartNumber=part_number, Body=data,
+        )
+        self.parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+    def complete(self) -> None:
+        """Upload the remaining buffer as the last part and assemble the object."""
+        part = self.take_part(final=True)
+        if part is not None or not self.parts:
+            self.upload_part(*(part or (self._next_part, b'')))
+        self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={"Parts": sorted(self.parts, key=lambda part: part["PartNumber"])},
+        )
+        if self.on_complete is not None:
+            self.on_complete()
+
+    def abort(self) -> None:
+        self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id)
+
+
+class _ObjectStream:
+    """Chunks of one object, filled by a fetch thread through a bounded queue."""
+
+    _END = object()
+
+    def __init__(self, max_chunks: int):
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self.cancelled = threading.Event()
+
+    def put(self, item) -> bool:
+        """Hand an item to the reader, gives up once the reader went away."""
+        while not self.cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def finish(self, error: Optional[Exception] = None) -> None:
+        self.put(error if error is not None else self._END)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            item = self._queue.get()
+            if item is self._END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+class _S3Client:
+    """
+    Result file storage in an S3 bucket.
+
+    The boto3 client is created on first use from the settings, so importing
+    this module needs neither boto3 nor S3 credentials.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None):
+        """
+        Initialize S3 storage.
+
+        Args:
+            settings: Endpoint, credentials and bucket, read from the environment by default
+        """
+        self._settings = settings
+        self._client = None
+        self._client_lock = threading.Lock()
+        # Blocking boto3 calls of the async interface run here instead of on the event loop
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self._listing_cache = TTLCache(maxsize=64, ttl=S3_LIST_CACHE_TTL)
+        self._listing_lock = threading.Lock()
+
+    @property
+    def settings(self) -> Settings:
+        return self._settings or get_settings()
+
+    @property
+    def bucket_name(self) -> str:
+        return self.settings.s3_bucket_name
+
+    @property
+    def s3_client(self):
+        """The boto3 S3 client, boto3 is imported when it is first needed."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    def _create_client(self):
+        import boto3
+        from botocore.config import Config
+
+        settings = self.settings
+        settings.require('s3_endpoint', 's3_access_key', 's3_secret_key', 's3_bucket_name')
+        return boto3.client(
             's3',
-            endpoint_url=endpoint,
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key
+            endpoint_url=settings.s3_endpoint,
+            aws_access_key_id=settings.s3_access_key,
+            aws_secret_access_key=settings.s3_secret_key,
+            config=Config(
+                max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                connect_timeout=S3_CONNECT_TIMEOUT,
+                read_timeout=S3_READ_TIMEOUT,
+                retries={"max_attempts": 3, "mode": "standard"},
+            ),
         )
 
-    def get_objects(self) -> list:
-        response = self.s3_client.list_objects(Bucket=self.bucket_name)['Contents']
-        files = []
-        for file in response:
-            files.append({"name": file['Key'].replace("/tmp/", ''), "size": file['Size'], "last_modified": file["LastModified"].strftime('%Y-%m-%d %H:%M')})
+    def iter_objects(self, prefix: str = '') -> Iterator[dict]:
+        """Iterate over all result objects whose name starts with `prefix`, page by page."""
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f'/tmp/{prefix}'):
+            # Empty buckets and prefixes come back without 'Contents'
+            for file in page.get('Contents', []):
+                yield {"name": file['Key'].replace("/tmp/", '', 1), "size": file['Size'], "last_modified": file["LastModified"].strftime('%Y-%m-%d %H:%M')}
+
+    def get_objects(self, prefix: str = '', model: Optional[str] = None, lang: Optional[str] = None) -> list:
+        """
+        List result files, served from a short-lived cache.
 
+        Args:
+            prefix: Object name prefix
+            model: Only files of this model, e.g. 'yandexGPT'
+            lang: Only files in this language, e.g. 'ru'
+
+        Returns:
+            list: File name, size and modification time of every matching file
+        """
+        if model is not None and not prefix:
+            # Names start with the model, so S3 can narrow the listing itself
+            prefix = f'{model}-'
+        with self._listing_lock:
+            files = self._listing_cache.get(prefix)
+        if files is None:
+            files = list(self.iter_objects(prefix))
+            with self._listing_lock:
+                self._listing_cache[prefix] = files
+        if model is not None:
+            files = [file for file in files if file['name'].startswith(f'{model}-')]
+        if lang is not None:
+            files = [file for file in files if os.path.splitext(file['name'])[0].endswith(f'_{lang}')]
         return files
 
+    def get_objects_page(self, page: int = 1, page_size: int = 50, **filters) -> dict:
+        """One page of `get_objects`, with the total count for pagination."""
+        files = self.get_objects(**filters)
+        start = (page - 1) * page_size
+        return {
+            "files": files[start:start + page_size],
+            "page": page,
+            "page_size": page_size,
+            "total": len(files),
+            "pages": max(1, math.ceil(len(files) / page_size)),
+        }
+
+    def invalidate_listing(self) -> None:
+        """Drop cached listings after the bucket content changed."""
+        with self._listing_lock:
+            self._listing_cache.clear()
+
     def save(self, data: bytes, object_name: str | None) -> bool:
         """Save a bytes object to the S3 bucket."""
+        from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+
         if object_name is None:
             raise ValueError("Object name must be provided")
         try:
             self.s3_client.upload_fileobj(BytesIO(data), self.bucket_name, f'/tmp/{object_name}')
+            self.invalidate_listing()
             return True
         except (NoCredentialsError, PartialCredentialsError) as e:
             print(f"Error uploading file: {e}")
             return False
 
-    def download(self, object_name: str) -> dict:
-        """Download a single file from the S3 bucket and return it as a FileResponse for FastAPI."""
+    def start_upload(self, object_name: str, part_size: int = S3_PART_SIZE) -> MultipartUpload:
+        """Start a multipart upload of an object."""
+        key = f'/tmp/{object_name}'
+        response = self.s3_client.create_multipart_upload(Bucket=self.bucket_name, Key=key)
+        return MultipartUpload(self.s3_client, self.bucket_name, key, response["UploadId"], part_size, on_complete=self.invalidate_listing)
+
+    def abort_upload(self, object_name: str, upload_id: str) -> None:
+        """Drop an unfinished multipart upload and its uploaded parts."""
+        self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=f'/tmp/{object_name}', UploadId=upload_id)
+
+    def download(self, object_name: str, byte_range: Optional[str] = None, if_match: Optional[str] = None) -> dict:
+        """
+        Download a single file from the S3 bucket and return it as a FileResponse for FastAPI.
+
+        Args:
+            object_name: File to download
+            byte_range: Optional HTTP range of the object, e.g. 'bytes=1048576-'
+            if_match: Optional ETag the object must still have, S3 answers 412 otherwise
+
+        Returns:
+            dict: File name, object key and the get_object response with the streamed 'Body'
+        """
         file_path = f"/tmp/{object_name}"
-        file = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_path)
+        conditions = {}
+        if byte_range is not None:
+            conditions["Range"] = byte_range
+        if if_match is not None:
+            conditions["IfMatch"] = if_match
+        file = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_path, **conditions)
         return {
                 "file_name": object_name,
                 "path": file_path,
@@ -45,31 +283,133 @@ class _S3Client:
             }
         
 
-    def download_multiple(self, object_names: list[str]) -> list[dict]:
+    def exists(self, object_name: str) -> bool:
+        """Check with a HEAD request whether a file is in the bucket."""
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=f"/tmp/{object_name}")
+        except Exception as e:
+            # HEAD responses have no body, a missing key is reported as the bare status
+            if error_code(e) in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def download_multiple(self, object_names: list[str], parallelism: int = S3_DOWNLOAD_PARALLELISM) -> list[dict]:
         """Download multiple files from the S3 bucket"""
-        responses = []
-        for object_name in object_names:
-            file_path = f"/tmp/{object_name}"
-            file = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_path)
-            file_dict = {
-                "file_name": object_name,
-                "path": file_path,
-                "content": file, 
-            }
-            responses.append(file_dict)
-        return responses
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            return list(executor.map(self.download, object_names))
+
+    def stream_multiple(
+        self,
+        object_names: list[str],
+        parallelism: int = S3_DOWNLOAD_PARALLELISM,
+        chunk_size: int = S3_CHUNK_SIZE,
+        prefetch_chunks: int = S3_PREFETCH_CHUNKS,
+    ) -> Iterator[Tuple[str, Iterator[bytes]]]:
+        """
+        Fetch objects concurrently and yield their chunks in the given order.
+
+        Up to `parallelism` objects are read at once, each buffering at most
+        `prefetch_chunks` chunks ahead of the reader, so no object is held in memory.
+
+        Args:
+            object_names: Files to fetch
+            parallelism: Objects fetched at the same time
+            chunk_size: Bytes per chunk
+            prefetch_chunks: Chunks buffered per object
+
+        Yields:
+            Tuple[str, Iterator[bytes]]: File name and its chunks, to be consumed before the next file
+        """
+        streams = [_ObjectStream(prefetch_chunks) for _ in object_names]
+
+        def fetch(object_name: str, stream: _ObjectStream) -> None:
+            if stream.cancelled.is_set():
+                return
+            try:
+                body = self.download(object_name)['content']['Body']
+                for chunk in body.iter_chunks(chunk_size):
+                    if not stream.put(chunk):
+                        break
+                body.close()
+                stream.finish()
+            except Exception as e:
+                stream.finish(e)
+
+        executor = ThreadPoolExecutor(max_workers=parallelism)
+        try:
+            for object_name, stream in zip(object_names, streams):
+                executor.submit(fetch, object_name, stream)
+            for object_name, stream in zip(object_names, streams):
+                yield object_name, iter(stream)
+        finally:
+            # Release fetch threads blocked on a reader that stopped early
+            for stream in streams:
+                stream.cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
     
     def delete(self, object_names: list[str]):
         """Delete multiple files from the S3 bucket"""
         files = []
         for object_name in object_names:
             files.append({"Key": f'/tmp/{object_name}'})
-        return self.s3_client.delete_objects(Bucket=self.bucket_name, Delete={'Objects': files})
+        try:
+            return self.s3_client.delete_objects(Bucket=self.bucket_name, Delete={'Objects': files})
+        finally:
+            self.invalidate_listing()
+
+    # Async interface: the same operations, run on a dedicated thread pool sized to the connection pool
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=S3_MAX_POOL_CONNECTIONS, thread_name_prefix="s3")
+        return self._executor
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run a blocking call, e.g. `upload.upload_part`, on the S3 thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def aget_objects_page(self, page: int = 1, page_size: int = 50, **filters) -> dict:
+        return await self.run(self.get_objects_page, page, page_size, **filters)
+
+    async def astart_upload(self, object_name: str, part_size: int = S3_PART_SIZE) -> MultipartUpload:
+        return await self.run(self.start_upload, object_name, part_size)
+
+    async def adownload(self, object_name: str, byte_range: Optional[str] = None, if_match: Optional[str] = None) -> dict:
+        return await self.run(self.download, object_name, byte_range, if_match)
+
+    async def aexists(self, object_names: list[str]) -> list[bool]:
+        """Check several files at once, in the given order."""
+        return list(await asyncio.gather(*(self.run(self.exists, name) for name in object_names)))
+
+    async def adelete(self, object_names: list[str]):
+        return await self.run(self.delete, object_names)
+
+    async def aiter_chunks(self, body, chunk_size: int = S3_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Read a get_object 'Body' chunk by chunk without blocking the event loop."""
+        try:
+            while True:
+                chunk = await self.run(body.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+def error_code(error: Exception) -> Optional[str]:
+    """S3 error code of a failed boto3 call, e.g. 'NoSuchKey', without importing botocore."""
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code")
+    return None
 
 
-S3Client = _S3Client(
-    endpoint=os.environ["S3_ENDPOINT"],
-    access_key=os.environ["S3_ACCESS_KEY"],
-    secret_key=os.environ["S3_SECRET_KEY"],
-    bucket_name=os.environ["S3_BUCKET_NAME"],
-)
+S3Client = _S3Client()
@@ -0,0 +1,177 @@
+"""Canonical scenario keys, deduplication and sampling without repeats."""
+import random
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple, TypeVar
+
+from .generator import SCENARIO_DIMENSIONS, generate_scenarios_characters
+from .lang import get_localized_data
+
+# Consecutive repeats after which a dimension counts as exhausted by the sampler
+DEFAULT_MAX_MISSES = 1000
+
+T = TypeVar("T")
+
+# (character index in `all_chars`, count) pairs of one side, sorted by index
+Side = Tuple[Tuple[int, int], ...]
+
+
+class ScenarioKey(NamedTuple):
+    """
+    Canonical form of a scenario.
+
+    Characters are identified by their position in `all_chars`, which is the
+    same in every language, so equal scenarios get equal keys whatever order
+    the characters were drawn in and whatever language they were rendered in.
+    """
+    dimension: str
+    side_1: Side
+    side_2: Side
+
+    def __str__(self) -> str:
+        sides = ("+".join(f"{count}x{char}" for char, count in side) for side in (self.side_1, self.side_2))
+        return f"{self.dimension}:{'|'.join(sides)}"
+
+
+_char_index_cache: Dict[str, Tuple[object, Dict[str, int]]] = {}
+
+
+def _char_indices(lang: str) -> Dict[str, int]:
+    """Localized character name -> position in `all_chars`, rebuilt when the tables are reloaded."""
+    data = get_localized_data(lang)
+    cached = _char_index_cache.get(lang)
+    if cached is None or cached[0] is not data:
+        index: Dict[str, int] = {}
+        for i, char in enumerate(data.all_chars):
+            index.setdefault(char, i)
+        cached = _char_index_cache[lang] = (data, index)
+    return cached[1]
+
+
+def _side(count_dict: Dict[str, int], char_index: Dict[str, int]) -> Side:
+    return tuple(sorted((char_index[char], count) for char, count in count_dict.items()))
+
+
+def scenario_key(scenario_info: dict, lang: str) -> ScenarioKey:
+    """
+    Canonical key of a generated scenario.
+
+    Args:
+        scenario_info: Scenario info as returned by generate_scenarios_characters
+        lang: Language the character names in the count dicts are in
+
+    Returns:
+        ScenarioKey: Dimension and the sorted character counts of both sides
+    """
+    char_index = _char_indices(lang)
+    return ScenarioKey(
+        scenario_info["scenario_dimension"],
+        _side(scenario_info["count_dict_1"], char_index),
+        _side(scenario_info["count_dict_2"], char_index),
+    )
+
+
+class ScenarioIndex:
+    """Set of seen scenarios, keyed canonically."""
+
+    def __init__(self, lang: str):
+        """
+        Initialize scenario index.
+
+        Args:
+            lang: Language of the scenario infos added to the index
+        """
+        self.lang = lang
+        self._keys: Set[ScenarioKey] = set()
+        self._per_dimension: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, scenario_info: dict) -> bool:
+        return scenario_key(scenario_info, self.lang) in self._keys
+
+    def count(self, dimension: str) -> int:
+        """Number of distinct scenarios seen in a dimension."""
+        return self._per_dimension.get(dimension, 0)
+
+    def add(self, scenario_info: dict) -> bool:
+        """Add a scenario, returns False if an equal one was already seen."""
+        key = scenario_key(scenario_info, self.lang)
+        if key in self._keys:
+            return False
+        self._keys.add(key)
+        self._per_dimension[key.dimension] = self._per_dimension.get(key.dimension, 0) + 1
+        return True
+
+    def dedupe(self, items: Iterable[T], scenario_info: Callable[[T], dict] = lambda item: item["scenario_info"]) -> Iterator[T]:
+        """
+        Drop repeated scenarios from a stream, keeping the first occurrence.
+
+        Args:
+            items: Prompt data dicts or other items carrying a scenario info
+            scenario_info: Extracts the scenario info of an item
+
+        Yields:
+            Items whose scenario was not seen before
+        """
+        for item in items:
+            if self.add(scenario_info(item)):
+                yield item
+
+
+class UniqueScenarioSampler:
+    """
+    Draws scenarios like generate_prompt_data, but never the same one twice.
+
+    Repeats are redrawn, so the mix of dimensions and pair counts follows the
+    regular generator. A dimension that produces `max_misses` repeats in a row
+    is treated as exhausted and no longer drawn.
+    """
+
+    def __init__(
+        self,
+        lang: str,
+        rng: Optional[random.Random] = None,
+        dimensions: Optional[Sequence[str]] = None,
+        index: Optional[ScenarioIndex] = None,
+        max_misses: int = DEFAULT_MAX_MISSES,
+    ):
+        """
+        Initialize unique scenario sampler.
+
+        Args:
+            lang: Language code ('en' or 'ru')
+            rng: Random generator of the run
+            dimensions: Dimensions to draw from, all by default
+            index: Scenarios to avoid, e.g. shared with an earlier run
+            max_misses: Consecutive repeats after which a dimension is given up
+        """
+        self.lang = lang
+        self.rng = rng or random.Random()
+        self.dimensions: List[str] = list(dimensions or SCENARIO_DIMENSIONS)
+        self.index = index or ScenarioIndex(lang)
+        self.max_misses = max_misses
+        self.repeats = 0
+        self._misses = {dimension: 0 for dimension in self.dimensions}
+
+    def sample(self) -> Tuple[str, str, dict]:
+        """
+        Draw the next unseen scenario.
+
+        Returns:
+            Tuple[str, str, dict]: Formatted character sets and scenario info, as generate_scenarios_characters
+
+        Raises:
+            ValueError: Every dimension is exhausted
+        """
+        while self.dimensions:
+            dimension = self.rng.choice(self.dimensions)
+            scenario = generate_scenarios_characters(self.lang, dimension, rng=self.rng)
+            if self.index.add(scenario[2]):
+                self._misses[dimension] = 0
+                return scenario
+            self.repeats += 1
+            self._misses[dimension] += 1
+            if self._misses[dimension] >= self.max_misses:
+                print(f"Scenario dimension {dimension} exhausted after {self.index.count(dimension)} distinct scenarios")
+                self.dimensions.remove(dimension)
+        raise ValueError("Scenario space exhausted")
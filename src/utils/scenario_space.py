@@ -0,0 +1,245 @@
+"""Exhaustive, lazily enumerated space of canonical scenarios."""
+import bisect
+from functools import lru_cache
+from itertools import combinations_with_replacement, groupby
+from math import comb
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .bulk import MAX_PAIRS, _index_tables
+from .generator import SCENARIO_DIMENSIONS, SCENARIO_DIMENSION_GROUP_TYPES, format_character_counts
+from .lang import get_localized_data
+from .scenario_index import ScenarioKey, Side
+
+# Multiset of character indices, sorted
+Multiset = Tuple[int, ...]
+
+
+def _multisets(chars: Sequence[int], size: int) -> Iterator[Multiset]:
+    return combinations_with_replacement(chars, size)
+
+
+def _side(multiset: Multiset) -> Side:
+    return tuple((char, len(list(group))) for char, group in groupby(multiset))
+
+
+def _count_multisets(n: int, size: int) -> int:
+    return comb(n + size - 1, size)
+
+
+@lru_cache(maxsize=None)
+def _random_sides(num_chars: int) -> Tuple[Multiset, ...]:
+    """Every side of a random dimension: 1-5 characters, by size, then lexicographically."""
+    return tuple(
+        multiset
+        for size in range(1, MAX_PAIRS + 1)
+        for multiset in _multisets(range(num_chars), size)
+    )
+
+
+class _PairedSpace:
+    """
+    Canonical scenarios of a paired dimension.
+
+    A scenario is a multiset of left characters and one of right characters of
+    the same size that some multiset of table pairs produces. Both sides are
+    enumerated in order and infeasible combinations are skipped.
+    """
+
+    def __init__(self, left_chars: Sequence[int], right_chars: Sequence[int]):
+        """
+        Initialize paired space.
+
+        Args:
+            left_chars: Left character index of every table pair
+            right_chars: Right character index of every table pair
+        """
+        self.rights: Tuple[int, ...] = tuple(sorted(set(int(char) for char in right_chars)))
+        bits = {char: bit for bit, char in enumerate(self.rights)}
+        # Left character -> bit mask of the right characters it is paired with
+        self.neighbours: Dict[int, int] = {}
+        for left, right in zip(left_chars, right_chars):
+            self.neighbours[int(left)] = self.neighbours.get(int(left), 0) | 1 << bits[int(right)]
+        self._bits = bits
+        self.left_sides: Tuple[Multiset, ...] = tuple(
+            multiset
+            for size in range(1, MAX_PAIRS + 1)
+            for multiset in _multisets(sorted(self.neighbours), size)
+        )
+
+        # One pass over the space to count it, only the per-left-side offsets are kept
+        offsets = [0]
+        for left in self.left_sides:
+            offsets.append(offsets[-1] + self.count_right_sides(left))
+        # Number of scenarios before each left side, plus the total at the end
+        self.offsets: Tuple[int, ...] = tuple(offsets)
+
+    def feasible(self, left: Multiset, right: Multiset) -> bool:
+        """Whether the pair table can produce both sides at once (Hall's condition)."""
+        left_counts = _side(left)
+        right_counts = [(1 << self._bits[char], count) for char, count in _side(right)]
+        for subset in range(1, 1 << len(left_counts)):
+            demand, mask = 0, 0
+            for bit, (char, count) in enumerate(left_counts):
+                if subset >> bit & 1:
+                    demand += count
+                    mask |= self.neighbours[char]
+            if demand > sum(count for char_bit, count in right_counts if mask & char_bit):
+                return False
+        return True
+
+    def _candidates(self, left: Multiset) -> Tuple[List[int], bool]:
+        """Right characters paired with some character of `left`, and whether all of them are paired with every one."""
+        masks = {self.neighbours[char] for char in left}
+        reachable = 0
+        for mask in masks:
+            reachable |= mask
+        return [char for char in self.rights if reachable & 1 << self._bits[char]], len(masks) == 1
+
+    def count_right_sides(self, left: Multiset) -> int:
+        chars, complete = self._candidates(left)
+        if complete:
+            return _count_multisets(len(chars), len(left))
+        return sum(1 for _ in self.right_sides(left))
+
+    def right_sides(self, left: Multiset) -> Iterator[Multiset]:
+        """Right sides that complete `left` into a scenario."""
+        # Only characters paired with some left character can appear on the right
+        chars, complete = self._candidates(left)
+        candidates = _multisets(chars, len(left))
+        if complete:
+            # Every left character is paired with every candidate, so all of them are feasible
+            yield from candidates
+            return
+        for right in candidates:
+            if self.feasible(left, right):
+                yield right
+
+    def __len__(self) -> int:
+        return self.offsets[-1]
+
+    def iter_range(self, start: int, stop: int) -> Iterator[Tuple[Multiset, Multiset]]:
+        """Scenarios [start, stop) as (left, right) multisets."""
+        position = bisect.bisect_right(self.offsets, start) - 1
+        index = self.offsets[position]
+        for left in self.left_sides[position:]:
+            for right in self.right_sides(left):
+                if index >= stop:
+                    return
+                if index >= start:
+                    yield left, right
+                index += 1
+
+
+def _pair_table(dimension: str) -> Optional[Tuple[Sequence[int], Sequence[int]]]:
+    return _index_tables().pairs.get(dimension)
+
+
+@lru_cache(maxsize=None)
+def _paired_space(dimension: str) -> _PairedSpace:
+    return _PairedSpace(*_pair_table(dimension))
+
+
+def dimension_size(dimension: str) -> int:
+    """
+    Number of distinct canonical scenarios of a dimension.
+
+    Args:
+        dimension: Scenario dimension
+
+    Returns:
+        int: Size of the dimension's scenario space
+    """
+    if dimension not in SCENARIO_DIMENSIONS:
+        raise ValueError(f"Unknown scenario dimension: {dimension}")
+    if _pair_table(dimension) is not None:
+        return len(_paired_space(dimension))
+    num_chars = _index_tables().num_chars
+    sides = sum(_count_multisets(num_chars, size) for size in range(1, MAX_PAIRS + 1))
+    return sides * sides
+
+
+def iter_dimension(dimension: str, start: int = 0, stop: Optional[int] = None) -> Iterator[ScenarioKey]:
+    """
+    Lazily enumerate the canonical scenarios [start, stop) of one dimension.
+
+    Args:
+        dimension: Scenario dimension
+        start: Index of the first scenario
+        stop: Index after the last scenario, the end of the space by default
+
+    Yields:
+        ScenarioKey: Canonical scenarios in a fixed order
+    """
+    size = dimension_size(dimension)
+    stop = size if stop is None else min(stop, size)
+    if _pair_table(dimension) is not None:
+        for left, right in _paired_space(dimension).iter_range(start, stop):
+            yield ScenarioKey(dimension, _side(left), _side(right))
+        return
+    sides = _random_sides(_index_tables().num_chars)
+    for index in range(start, stop):
+        side_1, side_2 = divmod(index, len(sides))
+        yield ScenarioKey(dimension, _side(sides[side_1]), _side(sides[side_2]))
+
+
+def scenario_characters(key: ScenarioKey, lang: str) -> Tuple[str, str, dict]:
+    """
+    Render a canonical scenario like generate_scenarios_characters.
+
+    Args:
+        key: Canonical scenario
+        lang: Language code
+
+    Returns:
+        Tuple[str, str, dict]: Formatted character sets and scenario info, characters in table order
+    """
+    data = get_localized_data(lang)
+    count_dict_1, count_dict_2 = ({data.all_chars[char]: count for char, count in side} for side in (key.side_1, key.side_2))
+    scenario_info = {
+        "scenario_dimension": key.dimension,
+        "scenario_dimension_group_type": list(SCENARIO_DIMENSION_GROUP_TYPES[key.dimension]),
+        "count_dict_1": count_dict_1,
+        "count_dict_2": count_dict_2,
+    }
+    return format_character_counts(count_dict_1, data), format_character_counts(count_dict_2, data), scenario_info
+
+
+class ScenarioSpace:
+    """
+    Every canonical scenario of a set of dimensions, as one indexable sequence.
+
+    Nothing is materialized: the size is computed per dimension and any index
+    range can be enumerated on its own, so a full-coverage run can be sharded.
+    """
+
+    def __init__(self, dimensions: Union[None, str, Sequence[str]] = None):
+        """
+        Initialize scenario space.
+
+        Args:
+            dimensions: Dimension name or dimensions in enumeration order, all by default
+        """
+        if isinstance(dimensions, str):
+            dimensions = [dimensions]
+        self.dimensions: Tuple[str, ...] = tuple(dimensions or SCENARIO_DIMENSIONS)
+        self.sizes: Tuple[int, ...] = tuple(dimension_size(dimension) for dimension in self.dimensions)
+
+    def __len__(self) -> int:
+        return sum(self.sizes)
+
+    def __iter__(self) -> Iterator[ScenarioKey]:
+        return self.iter_range(0, len(self))
+
+    def iter_range(self, start: int, stop: int) -> Iterator[ScenarioKey]:
+        """Scenarios with global indices in [start, stop)."""
+        offset = 0
+        for dimension, size in zip(self.dimensions, self.sizes):
+            if start < offset + size and stop > offset:
+                yield from iter_dimension(dimension, max(start - offset, 0), min(stop - offset, size))
+            offset += size
+
+    def shards(self, count: int) -> List[Tuple[int, int]]:
+        """Split the space into `count` contiguous index ranges of nearly equal size."""
+        total = len(self)
+        bounds = [total * i // count for i in range(count + 1)]
+        return [(bounds[i], bounds[i + 1]) for i in range(count) if bounds[i] < bounds[i + 1]]
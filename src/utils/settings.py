@@ -0,0 +1,46 @@
+"""Service settings read from the environment on first use."""
+import os
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Credentials and endpoints of the external services, every field maps to an environment variable."""
+    s3_endpoint: Optional[str] = None
+    s3_access_key: Optional[str] = None
+    s3_secret_key: Optional[str] = None
+    s3_bucket_name: Optional[str] = None
+    catalog_id_yandexgpt: Optional[str] = None
+    auth_key_yandexgpt: Optional[str] = None
+    api_key_gigachat: Optional[str] = None
+    api_key_chatgpt: Optional[str] = None
+    chatgpt_url: Optional[str] = None
+    chatgpt_model: Optional[str] = None
+    lm_studio_url: Optional[str] = None
+    lm_studio_model: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(**{field.name: os.environ.get(field.name.upper()) for field in fields(cls)})
+
+    def require(self, *names: str) -> None:
+        """
+        Check that settings are configured.
+
+        Args:
+            *names: Field names, e.g. 's3_endpoint'
+
+        Raises:
+            RuntimeError: Naming the environment variables that are missing
+        """
+        missing = [name.upper() for name in names if not getattr(self, name)]
+        if missing:
+            raise RuntimeError(f"Missing environment variables: {', '.join(missing)}")
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Settings of the process, read once from the environment."""
+    return Settings.from_env()
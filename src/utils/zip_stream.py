@@ -0,0 +1,51 @@
+"""ZIP archives written on the fly into a streamed response."""
+import zipfile
+from typing import Iterable, Iterator, Tuple
+
+
+class _ChunkBuffer:
+    """Write-only, non-seekable file collecting the archive bytes between yields."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[Tuple[str, Iterable[bytes]]], compression: int = zipfile.ZIP_DEFLATED) -> Iterator[bytes]:
+    """
+    Build a ZIP archive from streamed files.
+
+    The output is not seekable, so sizes and checksums go into data descriptors
+    after each file and only the current chunk is held in memory.
+
+    Args:
+        entries: File names with their content chunks, e.g. from S3Client.stream_multiple
+        compression: zipfile compression method
+
+    Yields:
+        bytes: Consecutive pieces of the archive
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=compression) as archive:
+        for name, chunks in entries:
+            info = zipfile.ZipInfo(name)
+            info.compress_type = compression
+            with archive.open(info, mode='w', force_zip64=True) as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            yield buffer.drain()
+    yield buffer.drain()